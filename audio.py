@@ -0,0 +1,169 @@
+import array
+import concurrent.futures  # winsound plays on a worker thread
+import io
+import math
+import os
+import sys
+import wave
+
+# Which audio backend plays alerts: "qt", "winsound" or "silent". By default the first of the
+# platform's backends below that works is used.
+AUDIO_ENV_VAR = "LITTLEBITS_AUDIO"
+PLATFORM_BACKENDS = {
+    "win32": ("winsound", "qt", "silent"),
+}
+DEFAULT_BACKENDS = ("qt", "silent")
+
+SAMPLE_RATE = 44100
+VOLUME = 0.3         # of full scale
+FADE_SECONDS = 0.005  # ramp each tone in and out, so it doesn't click
+GAP_SECONDS = 0.02    # silence between the tones of a chime
+
+# Each alert is a sequence of (frequency in Hz, duration in ms) tones
+CHIMES = {
+    "time_added": ((880, 300),),
+    "times_up": ((880, 300), (932, 300), (988, 300), (1047, 900)),
+}
+
+
+# 16-bit mono PCM for a sequence of tones
+def synthesize(tones, sample_rate=SAMPLE_RATE):
+    samples = array.array("h")
+    amplitude = VOLUME * 32767
+    fade = int(sample_rate * FADE_SECONDS)
+    for frequency, duration_ms in tones:
+        count = int(sample_rate * duration_ms / 1000)
+        step = 2 * math.pi * frequency / sample_rate
+        tone = [amplitude * math.sin(step * i) for i in range(count)]
+        for i in range(min(fade, count // 2)):
+            tone[i] *= i / fade
+            tone[count - 1 - i] *= i / fade
+        samples.extend(map(int, tone))
+        samples.extend([0] * int(sample_rate * GAP_SECONDS))
+    if sys.byteorder != "little":
+        samples.byteswap()
+    return samples.tobytes()
+
+
+def wav_bytes(pcm, sample_rate=SAMPLE_RATE):
+    data = io.BytesIO()
+    with wave.open(data, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(sample_rate)
+        f.writeframes(pcm)
+    return data.getvalue()
+
+
+# Plays through QtMultimedia: each chime's PCM sits in a QBuffer, played by one QAudioSink
+# (a new alert cuts off one that's still playing). Needs a QApplication and an output device.
+class QtAudioBackend:
+    def __init__(self):
+        from PySide6.QtCore import QBuffer, QIODevice
+        from PySide6.QtMultimedia import QAudio, QAudioFormat, QAudioSink, QMediaDevices
+
+        device = QMediaDevices.defaultAudioOutput()
+        if device.isNull():
+            raise RuntimeError("no audio output device")
+        audio_format = QAudioFormat()
+        audio_format.setSampleRate(SAMPLE_RATE)
+        audio_format.setChannelCount(1)
+        audio_format.setSampleFormat(QAudioFormat.Int16)
+        if not device.isFormatSupported(audio_format):
+            raise RuntimeError("audio output doesn't support 16-bit mono")
+
+        self.sink = QAudioSink(device, audio_format)
+        self.sink.stateChanged.connect(self.state_changed)
+        self.idle_state = QAudio.IdleState
+        self.new_buffer = QBuffer
+        self.read_only = QIODevice.ReadOnly
+        self.buffers = {}
+        self.playing = None
+
+    def load(self, name, pcm):
+        buffer = self.new_buffer()
+        buffer.setData(pcm)  # (copied into the buffer's own QByteArray)
+        self.buffers[name] = buffer
+
+    def play(self, name):
+        self.sink.stop()
+        if self.playing is not None:
+            self.playing.close()
+        self.playing = self.buffers[name]
+        self.playing.open(self.read_only)
+        self.sink.start(self.playing)
+
+    def state_changed(self, state):
+        if state == self.idle_state:  # reached the end of the buffer
+            self.sink.stop()
+
+    def close(self):
+        self.sink.stop()
+
+
+# Plays through winsound (Windows only). winsound can't play from memory asynchronously, so
+# each chime is played on a worker thread; alerts queue up behind each other.
+class WinsoundBackend:
+    def __init__(self):
+        import winsound
+        self.winsound = winsound
+        self.player = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="audio")
+        self.sounds = {}
+
+    def load(self, name, pcm):
+        self.sounds[name] = wav_bytes(pcm)
+
+    def play(self, name):
+        self.player.submit(self.winsound.PlaySound, self.sounds[name], self.winsound.SND_MEMORY)
+
+    def close(self):
+        self.player.shutdown(wait=False)
+
+
+class SilentBackend:
+    def load(self, name, pcm):
+        pass
+
+    def play(self, name):
+        pass
+
+    def close(self):
+        pass
+
+
+BACKENDS = {
+    "qt": QtAudioBackend,
+    "winsound": WinsoundBackend,
+    "silent": SilentBackend,
+}
+
+
+# Alert sounds for the app. Every chime is synthesized once up front, so play() only has to
+# hand a ready buffer to the backend and returns straight away.
+class AudioAlerts:
+    def __init__(self, backend=None):
+        backend = backend or os.environ.get(AUDIO_ENV_VAR)
+        candidates = (backend,) if backend else PLATFORM_BACKENDS.get(sys.platform, DEFAULT_BACKENDS)
+        self.backend = None
+        for name in candidates:
+            if name not in BACKENDS:
+                raise ValueError(f"Unknown audio backend {name!r} (expected one of: {', '.join(BACKENDS)})")
+            try:
+                self.backend = BACKENDS[name]()
+            except (ImportError, RuntimeError) as e:
+                print(f"Audio backend {name!r} unavailable ({e})", flush=True)
+                continue
+            self.backend_name = name
+            break
+        if self.backend is None:
+            self.backend, self.backend_name = SilentBackend(), "silent"
+            print("Alerts will be silent", flush=True)
+
+        for name, tones in CHIMES.items():
+            self.backend.load(name, synthesize(tones))
+
+    def play(self, name):
+        self.backend.play(name)
+
+    def close(self):
+        self.backend.close()
@@ -0,0 +1,264 @@
+# Storage and navigation benchmarks: runs the real TaskApp (Qt "offscreen" platform, no window
+# on screen) against synthetic histories from generate.py and times what the app does with its
+# data: load_lists, populate_list_widgets, save_lists, load_notes, save_notes, stepping and
+# jumping between days, and startup. Results are written as JSON, and two runs can be compared.
+#
+#   python benchmarks/bench.py run --output before.json
+#   ... change something ...
+#   python benchmarks/bench.py run --output after.json
+#   python benchmarks/bench.py compare before.json after.json
+#
+# compare exits with status 1 if anything got slower by more than --threshold. Generated data
+# is cached (see --data-cache) and each run works on a copy of it, so runs see identical data.
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+repo = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, repo)
+
+import generate
+
+SCENARIOS = {
+    "1y-10tasks-100B": dict(days=365, backlog=10, note_bytes=100),
+    "5y-1000tasks-10KB": dict(days=5 * 365, backlog=1000, note_bytes=10_000),
+    "10y-10000tasks-1MB": dict(days=10 * 365, backlog=10_000, note_bytes=1_000_000, note_every=30),
+}
+DEFAULT_SCENARIOS = ("1y-10tasks-100B", "5y-1000tasks-10KB")  # the 10 year one takes a few minutes to generate
+
+# compare ignores changes smaller than this, however large in percent (timer noise)
+MIN_DELTA_MS = 0.05
+
+
+# Generated once per scenario + backend and kept; a ".complete" marker shows it finished
+def scenario_data(cache, name, backend):
+    folder = os.path.join(cache, f"{name}-{backend}")
+    if not os.path.exists(os.path.join(folder, ".complete")):
+        shutil.rmtree(folder, ignore_errors=True)
+        print(f"Generating {name} ({backend})...", flush=True)
+        generate.generate(os.path.join(folder, "data"), backend=backend, **SCENARIOS[name])
+        open(os.path.join(folder, ".complete"), "w").close()
+    return folder
+
+
+# Files the stores only ever replace, never write in place: day files, indexes, archive bundles
+REPLACED_FILE_RE = re.compile(r"\.json(\.\w+)?$|\.txt$")
+
+
+# A scratch copy to run against. Files that are only ever replaced can be hard links; the rest
+# (the SQLite database, the task journal, the archive's notes.N.dat, ...) are changed in place,
+# so they have to be really copied or a run would change the cached data.
+def working_copy(folder):
+    work = tempfile.mkdtemp(prefix="littlebits-bench-")
+    def copy(source, target):
+        if REPLACED_FILE_RE.search(os.path.basename(source)):
+            os.link(source, target)
+        else:
+            shutil.copy2(source, target)
+    shutil.copytree(os.path.join(folder, "data"), os.path.join(work, "data"), copy_function=copy)
+    os.symlink(os.path.join(repo, "assets"), os.path.join(work, "assets"))
+    return work
+
+
+def timed(function, repeat, setup=None):
+    times = []
+    for i in range(repeat):
+        if setup is not None:
+            setup(i)
+        started = time.perf_counter()
+        function()
+        times.append((time.perf_counter() - started) * 1000)
+    return {
+        "median_ms": statistics.median(times),
+        "mean_ms": statistics.fmean(times),
+        "min_ms": min(times),
+        "max_ms": max(times),
+        "runs": repeat,
+    }
+
+
+def run_scenario(app, littlebits, params, repeat, seed):
+    rng = random.Random(seed)
+    history = [datetime.date.today() - datetime.timedelta(days=offset) for offset in range(1, params["days"] + 1)]
+    results = {}
+
+    window = None
+    def open_window():
+        nonlocal window
+        window = littlebits.TaskApp()
+        window.show()
+        app.processEvents()  # (runs finish_startup)
+
+    results["startup"] = timed(open_window, 1)  # (once: only the first window in a process starts cold)
+    window.search_index.indexer.submit(lambda: None).result()  # let a first-time index build finish first
+    window.store.flush()
+
+    def show_random_day(i):
+        day = rng.choice(history)
+        window.display_date = window.current_date + datetime.timedelta(days=(day - window.current_date.date()).days)
+
+    results["load_lists"] = timed(window.load_lists, repeat, show_random_day)
+    results["populate_list_widgets"] = timed(window.populate_list_widgets, repeat,
+                                             lambda i: (show_random_day(i), window.load_lists()))
+
+    window.switch_to_notes_view()
+    results["load_notes"] = timed(window.load_notes, repeat, show_random_day)
+
+    # Saving happens on today's page, like in the app
+    window.move_to_date(window.current_date.strftime('%Y-%m-%d'))
+
+    def change_lists(i):
+        window.up_next_model.append(littlebits.Task.new(f"Benchmark task {i}"))
+
+    def change_notes(i):
+        window.notes_edit.setPlainText(f"Benchmark notes {i}\n" * 20)
+        window.notes_edit.document().setModified(True)
+
+    def and_flush(save):
+        def function():
+            save()
+            window.store.flush()
+        return function
+
+    results["save_lists"] = timed(window.save_lists, repeat, change_lists)
+    window.store.flush()
+    results["save_lists+flush"] = timed(and_flush(window.save_lists), repeat, change_lists)
+    results["save_notes"] = timed(window.save_notes, repeat, change_notes)
+    window.store.flush()
+    results["save_notes+flush"] = timed(and_flush(window.save_notes), repeat, change_notes)
+
+    # Stepping a day at a time (neighbours are prefetched) and jumping around at random
+    window.move_to_date(rng.choice(history[repeat:]).isoformat())
+    results["move_to_next_day"] = timed(window.move_to_next_day, repeat, lambda i: app.processEvents())
+    results["move_to_prev_day"] = timed(window.move_to_prev_day, repeat, lambda i: app.processEvents())
+    results["move_to_date"] = timed(lambda: window.move_to_date(rng.choice(history).isoformat()), repeat)
+
+    window.save_notes_on_exit()
+    window.close_store()
+    window.deleteLater()
+    app.processEvents()
+    return results
+
+
+def run(args):
+    os.environ["QT_QPA_PLATFORM"] = "offscreen"
+    os.environ["LITTLEBITS_AUDIO"] = "silent"
+    os.environ["LITTLEBITS_STORAGE"] = args.backend
+    os.environ["LITTLEBITS_ARCHIVE_DAYS"] = "0"  # (no archive pass running in the middle of the timings)
+    from PySide6 import __version__ as pyside_version
+    from PySide6.QtWidgets import QApplication
+
+    import littlebits
+
+    app = QApplication.instance() or QApplication([])
+    app.setStyleSheet(littlebits.app_stylesheet)
+
+    names = list(SCENARIOS) if args.scenarios == "all" else args.scenarios.split(",")
+    for name in names:
+        if name not in SCENARIOS:
+            raise SystemExit(f"Unknown scenario {name!r} (expected one of: {', '.join(SCENARIOS)}, or all)")
+
+    report = {
+        "meta": {
+            "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "pyside": pyside_version,
+            "platform": platform.platform(),
+            "backend": args.backend,
+            "repeat": args.repeat,
+        },
+        "scenarios": {},
+    }
+    home = os.getcwd()
+    for name in names:
+        work = working_copy(scenario_data(args.data_cache, name, args.backend))
+        os.chdir(work)  # (the app finds data/ and assets/ relative to where it runs)
+        try:
+            print(f"Running {name}...", flush=True)
+            results = run_scenario(app, littlebits, SCENARIOS[name], args.repeat, args.seed)
+        finally:
+            os.chdir(home)
+            shutil.rmtree(work, ignore_errors=True)
+        report["scenarios"][name] = {"params": SCENARIOS[name], "results": results}
+        for benchmark, result in results.items():
+            print(f"  {benchmark:<24}{result['median_ms']:10.3f} ms median  ({result['min_ms']:.3f} min)", flush=True)
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+    return 0
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=repo, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(args):
+    with open(args.base, encoding="utf-8") as f:
+        base = json.load(f)
+    with open(args.new, encoding="utf-8") as f:
+        new = json.load(f)
+
+    regressions = 0
+    print(f"{'scenario / benchmark':<48}{'base ms':>10}{'new ms':>10}{'change':>9}")
+    for name, scenario in new["scenarios"].items():
+        if name not in base["scenarios"]:
+            continue
+        for benchmark, result in scenario["results"].items():
+            before = base["scenarios"][name]["results"].get(benchmark)
+            if before is None:
+                continue
+            old_ms, new_ms = before["median_ms"], result["median_ms"]
+            change = (new_ms - old_ms) / old_ms if old_ms else 0.0
+            flag = ""
+            if change > args.threshold and new_ms - old_ms > MIN_DELTA_MS:
+                flag = "  REGRESSION"
+                regressions += 1
+            elif change < -args.threshold and old_ms - new_ms > MIN_DELTA_MS:
+                flag = "  faster"
+            print(f"{name + ' / ' + benchmark:<48}{old_ms:10.3f}{new_ms:10.3f}{change:+9.0%}{flag}")
+    print(f"{regressions} regression(s) beyond {args.threshold:.0%}")
+    return 1 if regressions else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Little Bits storage and navigation benchmarks")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="run the benchmarks and write results as JSON")
+    run_parser.add_argument("--scenarios", default=",".join(DEFAULT_SCENARIOS),
+                            help=f"comma-separated, or all (choices: {', '.join(SCENARIOS)})")
+    run_parser.add_argument("--backend", choices=["json", "sqlite"], default="json")
+    run_parser.add_argument("--repeat", type=int, default=20, help="timed runs per benchmark")
+    run_parser.add_argument("--seed", type=int, default=0, help="which random days are visited")
+    run_parser.add_argument("--output", default="benchmark-results.json")
+    run_parser.add_argument("--data-cache", default=os.path.join(tempfile.gettempdir(), "littlebits-bench"),
+                            help="where generated histories are kept between runs")
+
+    compare_parser = commands.add_parser("compare", help="compare two results files")
+    compare_parser.add_argument("base")
+    compare_parser.add_argument("new")
+    compare_parser.add_argument("--threshold", type=float, default=0.2,
+                                help="flag benchmarks whose median got slower by more than this (default 0.2 = 20%%)")
+
+    args = parser.parse_args(argv)
+    return run(args) if args.command == "run" else compare(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,88 @@
+# Synthetic history for benchmarks: a data folder with a task list for every day over some
+# years, a backlog of a given size that churns a little each day (a few tasks done, a few
+# added, one moved), and notes of a given size. Written through the real storage backend,
+# so it's laid out (and delta-encoded) exactly the way the app would have saved it.
+#
+#   python benchmarks/generate.py --days 1825 --backlog 1000 --note-bytes 10000 --to /tmp/bench-data
+#
+# Same arguments + seed = same data.
+import argparse
+import datetime
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import storage
+from storage import Task
+
+VERBS = ("write", "call", "email", "fix", "plan", "review", "clean", "book", "read", "sort", "pay", "draft")
+NOUNS = ("report", "garden", "invoice", "kitchen", "budget", "slides", "car", "taxes", "letter", "backup",
+         "closet", "recipe", "meeting", "photos", "lease", "bike")
+
+
+def task_title(rng, number):
+    return f"{rng.choice(VERBS).capitalize()} the {rng.choice(NOUNS)} #{number}"
+
+
+# A long run of word-ish text that notes are cut from (so big notes don't take long to make)
+def text_pool(rng, size=64 * 1024):
+    words = [rng.choice(VERBS + NOUNS) for _ in range(size // 6)]
+    lines = [" ".join(words[i:i + 12]) for i in range(0, len(words), 12)]
+    return "\n".join(lines) + "\n"
+
+
+def note_text(rng, pool, size):
+    start = rng.randrange(len(pool))
+    text = (pool[start:] + pool * (size // len(pool) + 1))[:size]
+    return text
+
+
+# Fills `root` with `days` days of history ending yesterday (so "today" is a fresh day whose
+# Up Next rolls over, like opening the app in the morning). Every note_every-th day gets notes.
+def generate(root, days, backlog, note_bytes, note_every=1, backend="json", churn=3, seed=0):
+    rng = random.Random(seed)
+    pool = text_pool(rng)
+    store = storage.STORES[backend](root)  # the bare backend: no journal or background saving needed here
+    end = datetime.date.today() - datetime.timedelta(days=1)
+    start = end - datetime.timedelta(days=days - 1)
+
+    made = 0
+    def new_task(date):
+        nonlocal made
+        made += 1
+        return Task(f"t{made:07d}", task_title(rng, made), date)
+
+    up_next = [new_task(start.isoformat()) for _ in range(backlog)]
+    for offset in range(days):
+        date = (start + datetime.timedelta(days=offset)).isoformat()
+        done_today = []
+        for _ in range(min(churn, len(up_next))):
+            done_today.append(up_next.pop(rng.randrange(len(up_next))).replace(completed=date))
+        done_today.sort(key=lambda task: task.title)
+        up_next.extend(new_task(date) for _ in range(len(done_today)))
+        if len(up_next) > 1:
+            up_next.insert(rng.randrange(len(up_next)), up_next.pop(rng.randrange(len(up_next))))
+        store.save_tasks(date, up_next, done_today)
+        if note_bytes and offset % note_every == 0:
+            store.save_note(date, note_text(rng, pool, note_bytes))
+    store.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a synthetic Little Bits data folder for benchmarks")
+    parser.add_argument("--to", dest="root", required=True, help="data folder to create")
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--backlog", type=int, default=100, help="tasks in Up Next")
+    parser.add_argument("--note-bytes", type=int, default=1000, help="size of each day's notes")
+    parser.add_argument("--note-every", type=int, default=1, help="only every Nth day has notes")
+    parser.add_argument("--backend", choices=list(storage.STORES), default="json")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    generate(args.root, args.days, args.backlog, args.note_bytes, args.note_every, args.backend, seed=args.seed)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,80 @@
+# Style benchmark: how long it takes to switch a widget's visual state the old way (a new
+# per-widget stylesheet, which Qt has to parse and then re-polish) versus the new way
+# (toggling a dynamic property matched by app_stylesheet, then re-polishing just that widget).
+#
+#   python benchmarks/style_bench.py [switches]
+#
+# Runs offscreen against a real TaskApp window, in a scratch data folder.
+import os
+import sys
+import tempfile
+import time
+
+repo = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, repo)
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+os.environ.setdefault("LITTLEBITS_AUDIO", "silent")
+
+from PySide6.QtWidgets import QApplication
+
+import littlebits
+
+
+def time_switches(switch, count):
+    started = time.perf_counter()
+    for i in range(count):
+        switch(i)
+    QApplication.processEvents()  # include any repaint the switches queued
+    return time.perf_counter() - started
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    count = int(argv[0]) if argv else 500
+
+    work = tempfile.mkdtemp(prefix="littlebits-bench-")
+    os.symlink(os.path.join(repo, "assets"), os.path.join(work, "assets"))
+    os.chdir(work)
+
+    app = QApplication.instance() or QApplication([])
+    app.setStyleSheet(littlebits.app_stylesheet)
+    window = littlebits.TaskApp()
+    window.show()
+    QApplication.processEvents()
+
+    # What the app used to do: a whole stylesheet per state, set on the widget itself. Tried on
+    # a single label, and on the left pane, where setStyleSheet re-polishes every widget inside it
+    targets = (
+        ("current_task_label", window.current_task_label,
+         ("background-color: #96C0B7; font-size: 16px; border-radius: 10px; padding: 5px;",
+          "background-color: #E3C9A8; font-size: 16px; border-radius: 10px; padding: 5px;")),
+        ("left pane", window.findChild(littlebits.QWidget, "leftPane"),
+         ("background-color: #E2E9D9;", "background-color: #DDE5D3;")),
+    )
+    states = ("task", "break")
+    for name, widget, old_states in targets:
+        def per_widget(i):
+            widget.setStyleSheet(old_states[i % 2])
+
+        def dynamic(i):
+            littlebits.set_style_state(widget, "state", states[i % 2])
+
+        # (one untimed round each first, so both start warm)
+        time_switches(per_widget, 10)
+        widget.setStyleSheet("")
+        time_switches(dynamic, 10)
+
+        per_widget_time = time_switches(per_widget, count)
+        widget.setStyleSheet("")
+        dynamic_time = time_switches(dynamic, count)
+
+        print(f"{count} state switches on {name}:")
+        print(f"  per-widget setStyleSheet   {per_widget_time * 1000:8.1f} ms  ({per_widget_time / count * 1e6:7.1f} us each)")
+        print(f"  dynamic property + polish  {dynamic_time * 1000:8.1f} ms  ({dynamic_time / count * 1e6:7.1f} us each)")
+        print(f"  speedup                    {per_widget_time / dynamic_time:8.1f}x")
+
+    window.close_store()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+import csv
+import os
+import re
+
+from storage import Task
+
+# Adding many tasks at once: from a multi-line paste into the task box, or from a file (plain
+# text, a Markdown checklist or CSV). Everything is read a line at a time and comes out as Tasks;
+# new_tasks() then drops any that are already on the list as they go by, so the caller can add
+# the rest in one go (one model update, one save) without the whole file ever being in memory.
+#
+# Each line is one task. Bullets ("- ", "* ", "1. "), checkboxes ("[ ] ") and surrounding
+# whitespace are stripped, ticked checkboxes ("[x] ") are skipped as already done, and
+# trailing exclamation marks set a priority for the task picker:
+#   - [ ] Pay rent !!      ->  "Pay rent", priority 3
+IMPORT_SUFFIXES = (".txt", ".md", ".markdown", ".csv")
+IMPORT_ERRORS = (OSError, UnicodeDecodeError, csv.Error)  # what read_file can raise on a bad file
+
+BULLET_RE = re.compile(r"^(?:[-*+•]|\d+[.)])\s+")
+CHECKBOX_RE = re.compile(r"^\[([ xX])\]\s*")
+PRIORITY_RE = re.compile(r"\s+(!+)$")
+
+
+# A Task from one line, or None if there's nothing to add (blank, ticked off, or a Markdown heading)
+def parse_line(line, markdown=False):
+    line = line.strip()
+    if markdown and line.startswith("#"):
+        return None
+    line = BULLET_RE.sub("", line, count=1)
+    checkbox = CHECKBOX_RE.match(line)
+    if checkbox is not None:
+        if checkbox.group(1) != " ":
+            return None
+        line = line[checkbox.end():]
+    meta = None
+    priority = PRIORITY_RE.search(line)
+    if priority is not None:
+        meta = {"priority": 1 + len(priority.group(1))}
+        line = line[:priority.start()]
+    line = line.strip()
+    if not line:
+        return None
+    return Task.new(line, meta)
+
+
+def parse_lines(lines, markdown=False):
+    for line in lines:
+        task = parse_line(line, markdown)
+        if task is not None:
+            yield task
+
+
+# CSV: the first row is a header if it names a "title" (or "task") or "priority" column; the
+# tasks are then the title column, with the priority column used if it holds a number. A header
+# without a title column is an error (rather than importing it as a task). With no header, each
+# row's first column is a task.
+def parse_csv(lines):
+    rows = csv.reader(lines)
+    header = next(rows, None)
+    if header is None:
+        return
+    names = [name.strip().lower() for name in header]
+    title_column = next((names.index(name) for name in ("title", "task") if name in names), None)
+    priority_column = names.index("priority") if "priority" in names else None
+    if title_column is None:
+        if priority_column is not None:
+            raise csv.Error("the header has no title (or task) column")
+        title_column = 0
+        rows = _chain_row(header, rows)
+    for row in rows:
+        if len(row) <= title_column:
+            continue
+        task = parse_line(row[title_column])
+        if task is None:
+            continue
+        if priority_column is not None and priority_column < len(row):
+            try:
+                priority = float(row[priority_column])
+            except ValueError:
+                priority = None
+            if priority is not None and priority > 0:
+                task = task.replace(meta={"priority": int(priority) if priority.is_integer() else priority})
+        yield task
+
+
+def _chain_row(first, rows):
+    yield first
+    yield from rows
+
+
+# Tasks from a file, read as it goes (so a huge file is never held in memory as text)
+def read_file(path):
+    suffix = os.path.splitext(path)[1].lower()
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        if suffix == ".csv":
+            yield from parse_csv(f)
+        else:
+            yield from parse_lines(f, markdown=suffix in (".md", ".markdown"))
+
+
+# Titles count as the same regardless of case and spacing
+def title_key(title):
+    return " ".join(title.split()).casefold()
+
+
+# (list of the tasks whose titles aren't in `existing` or earlier in `tasks`, how many were
+# skipped). `tasks` can be a generator such as read_file(path); it's only iterated once.
+def new_tasks(tasks, existing):
+    seen = {title_key(task.title) for task in existing}
+    added = []
+    skipped = 0
+    for task in tasks:
+        key = title_key(task.title)
+        if key in seen:
+            skipped += 1
+        else:
+            seen.add(key)
+            added.append(task)
+    return added, skipped
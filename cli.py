@@ -0,0 +1,144 @@
+import argparse
+import itertools
+import sys
+
+import bulk
+import core  # (no Qt anywhere in here, so this starts in a blink)
+import history
+import storage
+
+
+def print_day(session, date):
+    up_next, done_today = session.day(date)
+    print(f"Up next ({date}):")
+    for number, task in enumerate(up_next, 1):
+        print(f"  {number:>3}. {task.title}  [{task.id}]")
+    if not up_next:
+        print("  (nothing)")
+    print("Done:")
+    for task in done_today:
+        print(f"       {task.title}  [{task.id}]")
+    if not done_today:
+        print("  (nothing yet)")
+
+
+# A task given on the command line as its number in `list` (1 = top of Up Next) or by its id
+# (any unambiguous start of it)
+def find_task(session, date, which):
+    up_next, done_today = session.day(date)
+    if which.isdigit() and 1 <= int(which) <= len(up_next):
+        return up_next[int(which) - 1]
+    matches = [task for task in up_next + done_today if task.id.startswith(which)]
+    if len(matches) == 1:
+        return matches[0]
+    raise SystemExit(f"No single task matches {which!r} (use its number in `list`, or its id)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="littlebits", description="Little Bits from the command line (same data as the app)")
+    parser.add_argument("--backend", choices=list(storage.STORES), default=None, help=f"defaults to ${storage.STORAGE_ENV_VAR} or json")
+    parser.add_argument("--data", default=storage.DATA_DIR, help="data folder (default: data)")
+    parser.add_argument("--date", default=None, help="day to work on, YYYY-MM-DD (default: today)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    add = commands.add_parser("add", help="add tasks to Up Next (ones already on the day's lists are skipped)")
+    add.add_argument("titles", nargs="*", metavar="title", help='end with " !" / " !!" for a higher priority')
+    add.add_argument("--from", dest="source", help="also add every line of a .txt / .md checklist / .csv file")
+
+    commands.add_parser("list", help="show the day's tasks")
+
+    done = commands.add_parser("done", help="mark a task done")
+    done.add_argument("tasks", nargs="+", metavar="task", help="number in `list`, or id")
+
+    notes = commands.add_parser("notes", help="show or add to the day's notes")
+    notes_commands = notes.add_subparsers(dest="notes_command", required=True)
+    notes_commands.add_parser("show")
+    append = notes_commands.add_parser("append")
+    append.add_argument("text", nargs="+")
+
+    commands.add_parser("assign", help="pick a task from Up Next to work on (see picker.py)")
+
+    export = commands.add_parser("export", help="write the history out as JSONL, CSV, Markdown, or task_lists.json + notes.json")
+    export.add_argument("--to", dest="target", required=True,
+                        help="file to export to (- for stdout), or a folder for the json format")
+    export.add_argument("--format", choices=("json",) + history.FORMATS, default=None,
+                        help="defaults to the --to file's extension (.jsonl / .csv / .md), else json")
+    export.add_argument("--since", help="first day to include, YYYY-MM-DD (not for json)")
+    export.add_argument("--until", help="last day to include, YYYY-MM-DD (not for json)")
+
+    import_ = commands.add_parser("import", help="read back a JSONL / CSV / Markdown export (or a json export folder)")
+    import_.add_argument("--from", dest="source", required=True, help="file to import (- for stdin), or a json export folder")
+    import_.add_argument("--format", choices=("json",) + history.FORMATS, default=None,
+                         help="defaults to the file's extension, else json")
+    import_.add_argument("--since", help="first day to import, YYYY-MM-DD (not for json)")
+    import_.add_argument("--until", help="last day to import, YYYY-MM-DD (not for json)")
+
+    args = parser.parse_args(argv)
+    date = args.date or core.today()
+    if args.command == "add" and not args.titles and not args.source:
+        parser.error("add needs titles, or --from a file")
+
+    session = core.Session.open(args.backend, args.data)
+    try:
+        if args.command == "add":
+            tasks = bulk.parse_lines(args.titles)
+            if args.source:
+                tasks = itertools.chain(tasks, bulk.read_file(args.source))  # (read as it's added)
+            try:
+                added, skipped = session.add_tasks(tasks, date)  # (one save for the lot)
+            except bulk.IMPORT_ERRORS as e:
+                raise SystemExit(f"Couldn't read {args.source} ({e})")
+            for task in added:
+                print(f"Added: {task.title}  [{task.id}]")
+            if skipped:
+                print(f"Skipped {skipped} already on the list")
+        elif args.command == "list":
+            print_day(session, date)
+        elif args.command == "done":
+            # (look every task up first, so the numbers don't shift as tasks are marked done)
+            for task in [find_task(session, date, which) for which in args.tasks]:
+                if session.complete_task(task.id, date) is None:
+                    print(f"Already done: {task.title}")
+                else:
+                    print(f"Done: {task.title}")
+        elif args.command == "notes":
+            if args.notes_command == "show":
+                notes = session.load_note(date)
+                if notes:
+                    print(notes.rstrip("\n"))
+            else:
+                session.append_note(date, " ".join(args.text))
+        elif args.command == "assign":
+            task = session.pick_task(session.day(date)[0])
+            if task is None:
+                print("Nothing in Up Next to assign")
+                return 1
+            print(f"Your task: {task.title}  [{task.id}]")
+        elif args.command == "export":
+            format = history.format_for(args.target, args.format) or "json"
+            if format == "json":
+                storage.export_json(session.store, args.target)
+            else:
+                count = history.export_file(session.store, args.target, format, args.since, args.until)
+                if args.target != "-":
+                    print(f"Exported {count} day(s) to {args.target}")
+        elif args.command == "import":
+            format = history.format_for(args.source, args.format) or "json"
+            if format == "json":
+                session.import_json(args.source)
+            else:
+                try:
+                    count = history.import_file(session, args.source, format, args.since, args.until)
+                except history.IMPORT_ERRORS as e:
+                    raise SystemExit(f"Couldn't import {args.source} ({e})")
+                print(f"Imported {count} day(s) from {args.source}")
+    finally:
+        try:
+            session.close()
+        except storage.SaveError as e:
+            raise SystemExit(f"Couldn't save: {e}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,146 @@
+import bisect  # Done Today is kept in alphabetical order
+import datetime
+import os
+
+import bulk
+import picker
+import storage
+from storage import Task
+
+
+def today():
+    return datetime.date.today().isoformat()
+
+
+# Everything about tasks and notes that isn't drawing them: which tasks a day shows (with
+# rollover), adding/completing/removing tasks, notes, picking a task to work on, and keeping the
+# search index up to date as things are saved. No Qt in here, so the app and the command line
+# (cli.py) share the exact same rules and data.
+class Session:
+    def __init__(self, store, search_index=None):
+        self.store = store
+        self.search_index = search_index  # optional, updated on every save when set
+        self.picker = picker.TaskPicker(os.path.join(store.root, picker.PICK_STATS_FILE))
+
+    # Open the store the app uses ($LITTLEBITS_STORAGE picks the backend). The search index is
+    # only kept up to date if it already exists; otherwise the app builds it from scratch.
+    @classmethod
+    def open(cls, kind=None, root=storage.DATA_DIR):
+        store = storage.open_store(kind, root)
+        search_index = None
+        if os.path.exists(os.path.join(root, "search.db")):  # (search.SEARCH_FILE)
+            import search  # (only imported when needed: it's slow to load, and this is the CLI's path)
+            search_index = search.SearchIndex(store)
+        return cls(store, search_index)
+
+    # A day's (up_next, done_today) as new lists. If nothing was saved for that day, the most
+    # recent earlier day's Up Next rolls over, with nothing done yet.
+    def day(self, date):
+        todays_data = self.store.load_tasks(date)
+        if todays_data:
+            return list(todays_data.get("up_next", [])), list(todays_data.get("done_today", []))
+        previous = self.store.latest_tasks_before(date)
+        if previous is not None:
+            return list(previous[1].get("up_next", [])), []
+        return [], []
+
+    def save_day(self, date, up_next, done_today):
+        self.store.save_tasks(date, up_next, done_today)
+        if self.search_index is not None:
+            self.search_index.index_tasks(date, list(up_next) + list(done_today))
+
+    def add_task(self, title, date=None):
+        date = date or today()
+        up_next, done_today = self.day(date)
+        task = Task.new(title)
+        up_next.append(task)
+        self.save_day(date, up_next, done_today)
+        return task
+
+    # Add a batch of Tasks (e.g. from bulk.read_file) to the end of Up Next with a single save.
+    # Titles the day already has, in either list, are skipped; returns (tasks actually added,
+    # how many were skipped).
+    def add_tasks(self, tasks, date=None):
+        date = date or today()
+        up_next, done_today = self.day(date)
+        added, skipped = bulk.new_tasks(tasks, up_next + done_today)
+        if added:
+            up_next.extend(added)
+            self.save_day(date, up_next, done_today)
+        return added, skipped
+
+    # Move an Up Next task to Done Today (returns the done task, or None if there's no such task)
+    def complete_task(self, task_id, date=None):
+        date = date or today()
+        up_next, done_today = self.day(date)
+        for row, task in enumerate(up_next):
+            if task.id == task_id:
+                done = up_next.pop(row).mark_done()
+                insert_sorted(done_today, done)
+                self.save_day(date, up_next, done_today)
+                return done
+        return None
+
+    # Delete a task from either list (returns it, or None if there's no such task)
+    def remove_task(self, task_id, date=None):
+        date = date or today()
+        up_next, done_today = self.day(date)
+        for tasks in (up_next, done_today):
+            for row, task in enumerate(tasks):
+                if task.id == task_id:
+                    del tasks[row]
+                    self.save_day(date, up_next, done_today)
+                    return task
+        return None
+
+    # The next thing to work on from Up Next (None if it's empty), weighted by priority, age and
+    # recent rejections (see picker.py). Pass the list, or keep self.picker in step with it instead.
+    def pick_task(self, up_next=None):
+        if up_next is not None:
+            self.picker.reset(up_next)
+        return self.picker.pick()
+
+    # How an offered task went: "accepted", "rejected" (said No) or "skipped" (once it was running)
+    def record_pick(self, task, outcome):
+        self.picker.record(task.id, outcome)
+
+    def load_note(self, date):
+        return self.store.load_note(date) or ""
+
+    def save_note(self, date, notes):
+        self.store.save_note(date, notes)
+        if self.search_index is not None:
+            self.search_index.index_note(date, notes)
+
+    # Add a line (or lines) to the end of a day's notes
+    def append_note(self, date, text):
+        notes = self.load_note(date)
+        if notes and not notes.endswith("\n"):
+            notes += "\n"
+        self.save_note(date, notes + text)
+
+    # storage.import_json, but saved through save_day / save_note so the search index keeps up
+    def import_json(self, folder):
+        for kind, date, value in storage.legacy_files(folder):
+            if kind == "tasks":
+                self.save_day(date, *value)
+            else:
+                self.save_note(date, value)
+
+    # Returns once every save so far has been written and indexed
+    def flush(self):
+        self.store.flush()
+        if self.search_index is not None:
+            self.search_index.flush()
+
+    # Waits for pending saves and index updates to finish
+    def close(self):
+        self.picker.save()
+        if self.search_index is not None:
+            self.search_index.close()
+        self.store.close()
+
+
+# Done Today is kept sorted by title
+def insert_sorted(done_today, task):
+    done_today.insert(bisect.bisect_right(done_today, task.title, key=lambda task: task.title), task)
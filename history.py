@@ -0,0 +1,242 @@
+import csv
+import heapq
+import json
+import os
+import re
+import sys
+
+from storage import Task, new_temp
+
+# Exporting the whole history (or a date range of it) as one file, and importing such a file
+# back. Both go a day at a time: export loads one day, writes it and moves on, and import saves
+# each day as soon as it has read it, so memory use doesn't grow with the size of the history.
+#
+#   jsonl: one JSON object per day: {"date", "up_next": [tasks], "done_today": [tasks], "notes"}
+#          (a key is left out if the day has no such data)
+#   csv:   one row per task or note: date, kind (up_next / done_today / note / no_tasks), id,
+#          title, created, completed, meta (JSON), text (the note)
+#   md:    "## YYYY-MM-DD" per day with "### Up next" / "### Done" checklists and "### Notes";
+#          each task's id and dates ride along in an HTML comment, so it reads back losslessly
+#
+# Tasks are exported as saved, not as they'd show after rolling over.
+FORMATS = ("jsonl", "csv", "md")
+SUFFIXES = {".jsonl": "jsonl", ".ndjson": "jsonl", ".csv": "csv", ".md": "md", ".markdown": "md"}
+CSV_COLUMNS = ("date", "kind", "id", "title", "created", "completed", "meta", "text")
+IMPORT_ERRORS = (ValueError, OSError, csv.Error)  # what import_file raises on a bad file (ValueError covers bad UTF-8)
+IMPORT_FLUSH_DAYS = 200  # import waits for saves and index updates to catch up after this many days
+
+
+# The format named, or else the one the file name suggests (None if it doesn't say)
+def format_for(path, format=None):
+    return format or SUFFIXES.get(os.path.splitext(path)[1].lower())
+
+
+def in_range(date, since, until):
+    return (since is None or date >= since) and (until is None or date <= until)
+
+
+# (date, {"up_next", "done_today"} or None, notes or None) for every day with anything saved,
+# oldest first
+def saved_days(store, since=None, until=None):
+    previous = None
+    for date in heapq.merge(store.task_dates(), store.note_dates()):
+        if date == previous or not in_range(date, since, until):
+            continue
+        previous = date
+        yield date, store.load_tasks(date), store.load_note(date)
+
+
+def export_history(store, out, format, since=None, until=None):
+    writer = {"jsonl": write_jsonl, "csv": write_csv, "md": write_markdown}[format]
+    return writer(saved_days(store, since, until), out)
+
+
+# Export to a file ("-" for stdout); the file only appears once it's complete
+def export_file(store, path, format, since=None, until=None):
+    if path == "-":
+        return export_history(store, sys.stdout, format, since, until)
+    folder = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = new_temp(folder)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8", newline="") as out:
+            count = export_history(store, out, format, since, until)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+    return count
+
+
+# Saves every day in the file through `session` (a core.Session, so the search index keeps up);
+# days already saved are replaced. Saves are queued for background threads, so every
+# IMPORT_FLUSH_DAYS days it waits for them to be written, or a big file would pile them all up
+# in memory. Returns how many days were imported.
+def import_history(session, lines, format, since=None, until=None):
+    reader = {"jsonl": read_jsonl, "csv": read_csv, "md": read_markdown}[format]
+    count = 0
+    for date, tasks, notes in reader(lines):
+        if not in_range(date, since, until):
+            continue
+        if tasks is not None:
+            session.save_day(date, tasks["up_next"], tasks["done_today"])
+        if notes is not None:
+            session.save_note(date, notes)
+        count += 1
+        if count % IMPORT_FLUSH_DAYS == 0:
+            session.flush()
+    return count
+
+
+def import_file(session, path, format, since=None, until=None):
+    if path == "-":
+        return import_history(session, sys.stdin, format, since, until)
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        return import_history(session, f, format, since, until)
+
+
+def tasks_from_json(values, date, name):
+    return [Task.from_json(value, f"{date}.{name}.{i}") for i, value in enumerate(values)]
+
+
+# JSON Lines
+
+def write_jsonl(days, out):
+    count = 0
+    for date, tasks, notes in days:
+        line = {"date": date}
+        if tasks is not None:
+            line["up_next"] = [task.to_json() for task in tasks.get("up_next", [])]
+            line["done_today"] = [task.to_json() for task in tasks.get("done_today", [])]
+        if notes is not None:
+            line["notes"] = notes
+        out.write(json.dumps(line, ensure_ascii=False) + "\n")
+        count += 1
+    return count
+
+
+def read_jsonl(lines):
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            day = json.loads(line)
+            date = day["date"]
+        except (ValueError, KeyError, TypeError):
+            raise ValueError(f"line {number} isn't a day from a JSONL export")
+        tasks = None
+        if "up_next" in day or "done_today" in day:
+            tasks = {name: tasks_from_json(day.get(name, []), date, name) for name in ("up_next", "done_today")}
+        yield date, tasks, day.get("notes")
+
+
+# CSV
+
+def write_csv(days, out):
+    writer = csv.writer(out)
+    writer.writerow(CSV_COLUMNS)
+    count = 0
+    for date, tasks, notes in days:
+        if tasks is not None:
+            rows = [(name, task) for name in ("up_next", "done_today") for task in tasks.get(name, [])]
+            for name, task in rows:
+                meta = "" if task.meta is None else json.dumps(task.meta, ensure_ascii=False)
+                writer.writerow((date, name, task.id, task.title, task.created or "", task.completed or "", meta, ""))
+            if not rows:
+                writer.writerow((date, "no_tasks", "", "", "", "", "", ""))  # saved, but both lists empty
+        if notes is not None:
+            writer.writerow((date, "note", "", "", "", "", "", notes))
+        count += 1
+    return count
+
+
+# Rows come grouped by day (as written by write_csv); a day is passed on once the next one starts
+def read_csv(lines):
+    rows = csv.DictReader(lines)
+    if rows.fieldnames is None or not {"date", "kind"} <= set(rows.fieldnames):
+        raise ValueError("not a CSV export (it needs date and kind columns)")
+    date, tasks, notes = None, None, None
+    for row in rows:
+        if row["date"] != date:
+            if date is not None:
+                yield date, tasks, notes
+            date, tasks, notes = row["date"], None, None
+        kind = row["kind"]
+        if kind == "note":
+            notes = row.get("text") or ""
+            continue
+        if kind not in ("up_next", "done_today", "no_tasks"):
+            continue
+        if tasks is None:
+            tasks = {"up_next": [], "done_today": []}
+        if kind != "no_tasks":
+            meta = json.loads(row["meta"]) if row.get("meta") else None
+            tasks[kind].append(Task(row["id"] or f"{date}.{kind}.{len(tasks[kind])}", row["title"],
+                                    row.get("created") or None, row.get("completed") or None, meta))
+    if date is not None:
+        yield date, tasks, notes
+
+
+# Markdown
+
+MARKDOWN_SECTIONS = {"Up next": "up_next", "Done": "done_today"}
+MARKDOWN_TASK_RE = re.compile(r"^- \[( |x)\] (.*?)(?: <!-- (\{.*\}) -->)?$")
+
+
+def write_markdown(days, out):
+    out.write("# Little Bits history\n")
+    count = 0
+    for date, tasks, notes in days:
+        out.write(f"\n## {date}\n")
+        if tasks is not None:
+            for heading, name in MARKDOWN_SECTIONS.items():
+                out.write(f"\n### {heading}\n\n")
+                box = "x" if name == "done_today" else " "
+                for task in tasks.get(name, []):
+                    details = task.to_json()
+                    del details["title"]
+                    # (">" escaped so the JSON can't end the comment early)
+                    details = json.dumps(details, ensure_ascii=False).replace(">", "\\u003e")
+                    out.write(f"- [{box}] {task.title} <!-- {details} -->\n")
+        if notes is not None:
+            # Fenced with more backticks than the notes ever have in a row. One newline is always
+            # added before the closing fence (and taken off again by read_markdown).
+            longest = max((len(run) for run in re.findall(r"`+", notes)), default=0)
+            fence = "`" * max(3, longest + 1)
+            out.write(f"\n### Notes\n\n{fence}text\n{notes}\n{fence}\n")
+        count += 1
+    return count
+
+
+def read_markdown(lines):
+    date, tasks, notes, section = None, None, None, None
+    lines = iter(lines)
+    for line in lines:
+        line = line.rstrip("\r\n")
+        if line.startswith("## "):
+            if date is not None:
+                yield date, tasks, notes
+            date, tasks, notes, section = line[3:].strip(), None, None, None
+        elif date is None:
+            continue
+        elif line.startswith("### "):
+            section = MARKDOWN_SECTIONS.get(line[4:].strip(), line[4:].strip())
+            if section in ("up_next", "done_today") and tasks is None:
+                tasks = {"up_next": [], "done_today": []}
+        elif section == "Notes" and line.startswith("```"):
+            fence = line[:len(line) - len(line.lstrip("`"))]
+            body = []
+            for note_line in lines:
+                if note_line.rstrip("\r\n") == fence:
+                    break
+                body.append(note_line)
+            notes = "".join(body)[:-1]
+        elif section in ("up_next", "done_today"):
+            match = MARKDOWN_TASK_RE.match(line)
+            if match is None:
+                continue
+            details = json.loads(match.group(3)) if match.group(3) else {}
+            details["title"] = match.group(2)
+            details.setdefault("id", f"{date}.{section}.{len(tasks[section])}")
+            tasks[section].append(Task.from_json(details, None))
+    if date is not None:
+        yield date, tasks, notes
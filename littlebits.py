@@ -1,80 +1,158 @@
+import bisect  # to keep Done Today sorted as tasks are added
 import datetime  # grab the date!
-import json  # to save and load user data
+import hashlib  # to tell whether notes actually changed since they were loaded/saved
+import json  # drag and drop payloads
 import math
 import os  # to clear terminal screen when timer updates
-import random
 import sys  # to allow sys.exit(), the signal to end program when user chooses to quit
-import threading  # to allow user input while task timer is counting down, without stopping timer or blocking input
 import time
-import winsound
 
-# for GUI
-from PySide6.QtCore import *
-from PySide6.QtGui import *
-from PySide6.QtWidgets import *
-
-# Initialize global timer variable
-timer = 0
-timer_seconds = 0
+startup_started = time.perf_counter()  # for --profile-startup (everything from here on counts)
+
+# for GUI (only what's used: the star imports were a noticeable part of startup)
+from PySide6.QtCore import (Property, QAbstractAnimation, QAbstractListModel, QDate, QEasingCurve, QElapsedTimer,
+                            QMimeData, QModelIndex, QObject, QPointF, QPropertyAnimation, QSize, QTimer,
+                            QVariantAnimation, Qt, Signal)
+from PySide6.QtGui import QColor, QFont, QFontDatabase, QKeySequence, QPainter, QPalette, QPixmap, QShortcut
+from PySide6.QtWidgets import (QAbstractItemView, QApplication, QComboBox, QDateEdit, QDialog, QDialogButtonBox,
+                               QFileDialog, QFormLayout, QGraphicsScene, QGraphicsView, QHBoxLayout, QInputDialog, QLabel, QLineEdit, QListView, QListWidget,
+                               QMainWindow, QMenu, QMessageBox, QPlainTextEdit, QPushButton, QSplitter,
+                               QStackedWidget, QTextEdit, QVBoxLayout, QWidget)
+
+import audio  # alert chimes (see audio.py)
+import bulk  # adding many tasks at once, from a paste or a file (see bulk.py)
+import core  # task + notes rules shared with the command line (see core.py)
+import history  # exporting / importing the whole history as JSONL, CSV or Markdown (see history.py)
+import perf  # hot-path timings for the debug panel and $LITTLEBITS_PERF_LOG (see perf.py)
+import search  # full-text search over notes and tasks (see search.py)
+import storage  # per-day data files (see storage.py)
+from storage import Task
 
 have_active_task = False
 current_task = ''
 
-freq=1000
-dur=300
+# Each task (or break, or "Add Time") puts this much on the clock
+timer_block_seconds = 15 * 60
+
+# Label animations (see LabelAnimator) redraw at most this many times a second
+animation_max_fps = 30
+
+# Notes are saved this long after the user stops typing
+notes_save_delay_ms = 1500
+
+# How often to check for changes cli.py (or another window) made to the same data
+store_sync_interval_ms = 2000
 
 # Load the custom font from a font file
 font_path = "assets/Lora-Regular.ttf"  # Even if you have the file, you have to install the font
-lora_font = QFont("Lora", 12)  # Replace "Lora" with the font name and 12 with the desired size
+font_family, font_size = "Lora", 12  # Replace "Lora" with the font name and 12 with the desired size
+
+# The whole app's styling, set once on the QApplication. Widgets are picked out by objectName,
+# and visual states by dynamic properties: switching state (see set_style_state) just re-polishes
+# the one widget, it never parses a stylesheet again.
+# (No color or font-size on the labels LabelAnimator animates: it sets those itself)
+padding_top = 2  # Adjust as needed
+padding_bottom = 2  # Adjust as needed
+app_stylesheet = f"""
+    * {{
+        padding-top: {padding_top}px;
+        padding-bottom: {padding_bottom}px;
+    }}
+
+    /* Side panes, and every widget in them that isn't styled further down */
+    #leftPane, #leftPane QWidget, #rightPane, #rightPane QWidget {{
+        background-color: #E2E9D9;
+    }}
+    #leftPane QPushButton {{
+        background-color: #D4DFC7;
+        font-size: 15px;
+        border-radius: 5px;
+        padding: 2px;
+    }}
 
-# Set the custom font as the default font for the application
-QApplication.setFont(lora_font)
+    /* Borderless buttons: day arrows, search, add task */
+    QPushButton[plain="true"] {{
+        padding: 5px;
+        border: 0;
+    }}
 
-# Set the stylesheet for list widgets
-list_widget_stylesheet = """
-    QListWidget {
+    /* Task lists (named inside the panes too, to outrank the pane rule) */
+    QListView, #leftPane QListView, #rightPane QListView {{
         background-color: #D4DFC7;
         border-radius: 10px;
         padding: 5px;
-    }
-"""
+    }}
+    QListView::item:hover {{
+        background-color: #C8C8C8;
+    }}
 
-# Set the stylesheet for list widgets
-widget_stylesheet = """
-    QWidget {
-        background-color: #E2E9D9;
-    }
-"""
+    QLabel#dateLabel {{
+        background-color: #D4DFC7;
+        font-size: 18px;
+    }}
 
-button_stylesheet = """
-    QPushButton {
+    /* Current task: state is "idle", "task" or "break" */
+    QLabel#currentTaskLabel {{
+        background-color: #96C0B7;
+        border-radius: 10px;
+        padding: 5px;
+    }}
+    QLabel#currentTaskLabel[state="break"] {{
+        background-color: #E3C9A8;
+    }}
+
+    QLabel#timerLabel, QGraphicsView#hourglass {{
         background-color: #D4DFC7;
-        font-size: 15px;
-        border-radius: 5px;
-        padding: 2px;
-    }
+        border: 0;
+    }}
+    QLabel#timerLabel[flashing="true"] {{
+        background-color: #C9E4C5;
+    }}
 """
 
-def timer_thread(task):
-    global timerList
-    while timer > 0:
-        time.sleep(60)  # Sleep for 1 minute
-        timer -= 1
-
-def times_up_alert():
-    print("\n\tTime\'s up!", flush=True)
-    winsound.Beep(880,dur)
-    winsound.Beep(932,dur)
-    winsound.Beep(988,dur)
-    winsound.Beep(1047,900)
+# Switch a widget to another visual state from app_stylesheet (no-op if it's already in it).
+# polish() on its own has the stylesheet style drop the widget's cached rules and match them
+# again; the usual unpolish() first only resets what polish() sets back, at about a third more.
+def set_style_state(widget, name, value):
+    if widget.property(name) == value:
+        return
+    widget.setProperty(name, value)
+    widget.style().polish(widget)
+
+# Timing for --profile-startup: mark() after each phase, report() prints how long each took.
+# Does nothing unless enabled.
+class StartupProfile:
+    def __init__(self):
+        self.enabled = False
+        self.phases = []
+        self.last = startup_started
+
+    def mark(self, phase):
+        if self.enabled:
+            now = time.perf_counter()
+            self.phases.append((phase, now - self.last))
+            self.last = now
+
+    def report(self):
+        if not self.enabled:
+            return
+        print("Startup profile:", flush=True)
+        for phase, seconds in self.phases:
+            print(f"  {phase:<28}{seconds * 1000:8.1f} ms", flush=True)
+        print(f"  {'total':<28}{(self.last - startup_started) * 1000:8.1f} ms", flush=True)
+
+startup_profile = StartupProfile()
 
 class TaskApp(QMainWindow):
+    save_failed = Signal(str)  # (emitted from the save thread)
+    store_changed = Signal(object, object)  # (emitted from whichever thread noticed)
+
     def __init__(self):
         super().__init__()
-        global timer_seconds
 
         # Connect the aboutToQuit signal to the save_notes_on_exit slot
         QApplication.instance().aboutToQuit.connect(self.save_notes_on_exit)
+        QApplication.instance().aboutToQuit.connect(self.close_store)
 
         self.current_date = datetime.datetime.now()
         self.display_date = datetime.datetime.now()
@@ -83,12 +161,66 @@ class TaskApp(QMainWindow):
         self.done_today = []
         self.current_activity_assigned = False # either a break or a task
 
+        # User data: one small file per day under data/, or SQLite with LITTLEBITS_STORAGE=sqlite
+        # (either one migrates the old two-file format on first run). Saves are written in the background.
+        self.store = storage.open_store()
+        self.save_error_showing = False
+        self.save_failed.connect(self.show_save_error)
+        self.store.set_error_handler(lambda kind, date, error: self.save_failed.emit(f"{kind} for {date}: {error}"))
+        self.store_changed.connect(self.reload_changed_days)
+        self.store.set_change_handler(self.store_changed.emit)
+        self.core = core.Session(self.store)  # the app's task/notes logic, minus the drawing
+        self.search_dialog = None  # created the first time it's opened
+        self.perf_panel = None  # hidden debug panel (Ctrl+Shift+D), created the first time it's opened
+        self.lag_monitor = EventLoopLagMonitor(self)
+        startup_profile.mark("open store")
+
         self.setWindowTitle("Little Bits - The Task Tracker & Timer")
         self.setGeometry(100, 100, 600, 600)
 
+        # Countdown for the current task or break (saved to data/timer_state.json, see TimerEngine)
+        self.timer_engine = TimerEngine(os.path.join(self.store.root, "timer_state.json"), self)
+        self.timer_engine.tick.connect(self.update_timer)
+        self.timer_engine.expired.connect(self.time_up)
+
         self.setup_ui()              # Define UI elements
+        startup_profile.mark("build UI")
         self.load_lists()            # Load in user data, if available
+        startup_profile.mark("load tasks")
         self.populate_list_widgets() # After UI is fully initialized, can fill w/data
+        startup_profile.mark("fill task lists")
+
+        # Everything else isn't on screen yet, so it waits until the window is up
+        QTimer.singleShot(0, self.finish_startup)
+
+    # Runs once the event loop starts, after the window has been shown
+    def finish_startup(self):
+        startup_profile.mark("show window")
+
+        # Chimes are played in the background (set LITTLEBITS_AUDIO=qt/winsound/silent to pick how)
+        self.audio = audio.AudioAlerts()
+        startup_profile.mark("audio")
+        self.search_index = search.SearchIndex(self.store)
+        self.core.search_index = self.search_index  # (saves update it from here on)
+        startup_profile.mark("search index")
+        self.prefetch_adjacent_days()
+        self.resume_saved_timer()    # Pick up a task or break that was running when the app last closed
+        startup_profile.mark("prefetch + timer restore")
+        self.store.archive_in_background()  # Compress months gone cold (see storage.ARCHIVE_AFTER_DAYS)
+
+        # Pick up tasks and notes added from the command line while the app is open
+        self.store_sync_timer = QTimer(self)
+        self.store_sync_timer.timeout.connect(self.store.sync)
+        self.store_sync_timer.start(store_sync_interval_ms)
+
+        # With $LITTLEBITS_PERF_LOG set, metrics are appended to that file every so often (see perf.py)
+        self.perf_log = os.environ.get(perf.PERF_LOG_ENV_VAR)
+        if self.perf_log:
+            self.perf_log_timer = QTimer(self)
+            self.perf_log_timer.timeout.connect(self.dump_perf_log)
+            self.perf_log_timer.start(perf.PERF_LOG_INTERVAL_MS)
+            self.lag_monitor.start()
+        startup_profile.report()
 
     # Initialize the UI
     def setup_ui(self):
@@ -113,23 +245,39 @@ class TaskApp(QMainWindow):
         # Today's date will always be displayed by default when opening program
         default_date_formatted = datetime.datetime.now().strftime('%A, %B %d, %Y')
         self.prev_day_button = QPushButton("←")
-        self.prev_day_button.setStyleSheet("padding: 5px; border: 0;")
+        self.prev_day_button.setProperty("plain", True)
         self.date_label = QLabel(f"{default_date_formatted}")
         self.next_day_button = QPushButton("→")
-        self.next_day_button.setStyleSheet("padding: 5px; border: 0;")
+        self.next_day_button.setProperty("plain", True)
 
         pick_day_layout.addWidget(self.prev_day_button)
         pick_day_layout.addWidget(self.date_label)
         pick_day_layout.addWidget(self.next_day_button)
 
+        self.search_button = QPushButton("Search")
+        self.search_button.setProperty("plain", True)
+        self.search_button.setToolTip("Search all notes and tasks (Ctrl+F)")
+        pick_day_layout.addWidget(self.search_button)
+
+        self.history_button = QPushButton("History")
+        self.history_button.setProperty("plain", True)
+        self.history_button.setToolTip("Export or import your whole task and notes history")
+        history_menu = QMenu(self.history_button)
+        history_menu.addAction("Export history…", self.export_history)
+        history_menu.addAction("Import history…", self.import_history)
+        self.history_button.setMenu(history_menu)
+        pick_day_layout.addWidget(self.history_button)
+
         if have_active_task:
             self.current_task_label = QLabel(f"Current Task: {self.current_task}")
         else:
             self.current_task_label = QLabel(f"Current Task: (button here!)")
 
-        # Set the stylesheet for the date and current task labels
-        self.date_label.setStyleSheet("background-color: #D4DFC7; font-size: 18px; text-align: center;")
-        self.current_task_label.setStyleSheet("background-color: #96C0B7; font-size: 16px; border-radius: 10px; padding: 5px; text-align: center;")
+        # Name the date and current task labels for app_stylesheet
+        self.date_label.setObjectName("dateLabel")
+        self.current_task_label.setObjectName("currentTaskLabel")
+        self.current_task_label.setProperty("state", "idle")
+        self.current_task_animator = LabelAnimator(self.current_task_label, 16, QColor("black"))  # sets size + color
 
         date_and_task_layout.addWidget(pick_day_widget)
         date_and_task_layout.addWidget(self.current_task_label)
@@ -142,7 +290,7 @@ class TaskApp(QMainWindow):
 
         # Left pane
         left_pane = QWidget()
-        left_pane.setStyleSheet(widget_stylesheet)
+        left_pane.setObjectName("leftPane")
         left_pane.setMinimumWidth(125)  # Set the minimum width you prefer
         left_layout = QVBoxLayout(left_pane)
         splitter.addWidget(left_pane)
@@ -153,7 +301,8 @@ class TaskApp(QMainWindow):
 
         # Timer
         self.timer_label = QLabel('00:00')
-        self.timer_label.setStyleSheet("background-color: #D4DFC7; font-size: 18px;")
+        self.timer_label.setObjectName("timerLabel")
+        self.timer_animator = LabelAnimator(self.timer_label, 18, QColor("black"))  # sets size + color
         self.timer_label.setAlignment(Qt.AlignCenter)  # Center align the text
         self.timer_label.setContentsMargins(0, 0, 0, 0)
         left_layout.addWidget(self.timer_label)
@@ -192,18 +341,9 @@ class TaskApp(QMainWindow):
         # Decide which buttons to show
         self.display_control_buttons()
 
-        # Apply button styles
-        self.assign_task_button.setStyleSheet(button_stylesheet)
-        self.take_break_button.setStyleSheet(button_stylesheet)
-        self.tasks_view_button.setStyleSheet(button_stylesheet)
-        self.notes_view_button.setStyleSheet(button_stylesheet)
-        self.complete_task_button.setStyleSheet(button_stylesheet)
-        self.add_time_button.setStyleSheet(button_stylesheet)
-        self.pause_timer_button.setStyleSheet(button_stylesheet)
-
         # Right pane setup
         right_pane = QWidget()
-        right_pane.setStyleSheet(widget_stylesheet)   
+        right_pane.setObjectName("rightPane")
         right_layout = QVBoxLayout(right_pane)
         splitter.addWidget(right_pane)
 
@@ -212,10 +352,10 @@ class TaskApp(QMainWindow):
         right_layout.addWidget(self.stacked_widget)
         self.tasks_view = QWidget() # blank container for tasks UI elements
         self.notes_view = QWidget() # blank container for notes UI elements
+        self.notes_edit = None      # (the notes view is filled in the first time it's shown)
 
-        # Create widgets for tasks and notes views
+        # Create widgets for tasks view
         self.create_tasks_view()  # Add UI elements for tasks
-        self.create_notes_view()  # Add UI elements for notes
 
         # Add both views to stack, set task view as default
         self.stacked_widget.addWidget(self.tasks_view)
@@ -224,10 +364,11 @@ class TaskApp(QMainWindow):
         # can use setCurrentIndex, but this way initializes correct buttons for default view
         self.switch_to_tasks_view()
 
-        # Set up QTimer for saving notes
+        # Set up QTimer for saving notes: every edit restarts it, so it only fires once typing pauses
         self.notes_save_timer = QTimer(self)
+        self.notes_save_timer.setSingleShot(True)
+        self.notes_save_timer.setInterval(notes_save_delay_ms)
         self.notes_save_timer.timeout.connect(self.save_notes)
-        self.notes_save_timer.start(30000)  # Every 30 seconds
 
         # Set the stretch factors for the panes
         splitter.setStretchFactor(0, 1)
@@ -238,16 +379,25 @@ class TaskApp(QMainWindow):
         self.prev_day_button.clicked.connect(self.move_to_prev_day)
         self.next_day_button.clicked.connect(self.move_to_next_day)
 
+        # Ctrl+← / Ctrl+→ skip over empty days
+        self.prev_day_button.setToolTip("Previous day (Ctrl+← for the previous day with tasks or notes)")
+        self.next_day_button.setToolTip("Next day (Ctrl+→ for the next day with tasks or notes)")
+        QShortcut(QKeySequence("Ctrl+Left"), self, self.move_to_prev_day_with_data)
+        QShortcut(QKeySequence("Ctrl+Right"), self, self.move_to_next_day_with_data)
+
+        self.search_button.clicked.connect(self.open_search)
+        QShortcut(QKeySequence.Find, self, self.open_search)
+
+        # Not on any button: timings of the hot paths, for tracking down a slow session
+        QShortcut(QKeySequence("Ctrl+Shift+D"), self, self.open_perf_panel)
+
     def move_to_prev_day(self):
         # Save user data
         self.save_notes()
     
-        # Clear user data (python lists and widget data)
-        self.up_next.clear()
-        self.done_today.clear()
-        self.up_next_list.clear()
-        self.done_today_list.clear()
-        self.notes_edit.setPlainText("")
+        # Clear user data (the list views are refilled from these once the new day is loaded)
+        self.up_next = []
+        self.done_today = []
 
         # Decrement display date
         self.display_date -= datetime.timedelta(days=1)
@@ -259,12 +409,9 @@ class TaskApp(QMainWindow):
         # Save user data
         self.save_notes()
 
-        # Clear user data (python lists and widget data)
-        self.up_next.clear()
-        self.done_today.clear()
-        self.up_next_list.clear()
-        self.done_today_list.clear()
-        self.notes_edit.setPlainText("")
+        # Clear user data (the list views are refilled from these once the new day is loaded)
+        self.up_next = []
+        self.done_today = []
 
         # Increment display date
         self.display_date += datetime.timedelta(days=1)
@@ -272,10 +419,114 @@ class TaskApp(QMainWindow):
         # Update displayed date and load associated data
         self.update_displayed_date()
 
+    def move_to_prev_day_with_data(self):
+        day = self.store.prev_day_with_data(self.display_date.strftime('%Y-%m-%d'))
+        if day is not None:
+            self.move_to_date(day)
+
+    def move_to_next_day_with_data(self):
+        day = self.store.next_day_with_data(self.display_date.strftime('%Y-%m-%d'))
+        if day is not None:
+            self.move_to_date(day)
+
+    # Jump straight to a 'YYYY-MM-DD' date
+    def move_to_date(self, day):
+        # Save user data
+        self.save_notes()
+
+        # Clear user data (the list views are refilled from these once the new day is loaded)
+        self.up_next = []
+        self.done_today = []
+
+        # Keep display_date a whole number of days from current_date
+        days_away = (datetime.date.fromisoformat(day) - self.current_date.date()).days
+        self.display_date = self.current_date + datetime.timedelta(days=days_away)
+
+        # Update displayed date and load associated data
+        self.update_displayed_date()
+
+    def open_search(self):
+        if self.search_dialog is None:
+            self.search_dialog = SearchDialog(self.search_index, self)
+            self.search_dialog.hit_chosen.connect(self.show_search_hit)
+        self.search_dialog.show()
+        self.search_dialog.raise_()
+        self.search_dialog.activateWindow()
+
+    # Go to the day a search result is from, in the view it was found in
+    def show_search_hit(self, kind, day):
+        self.move_to_date(day)
+        if kind == "note":
+            self.switch_to_notes_view()
+        else:
+            self.switch_to_tasks_view()
+
+    def open_perf_panel(self):
+        if self.perf_panel is None:
+            self.perf_panel = PerfPanel(self.lag_monitor, self)
+        self.perf_panel.show()
+        self.perf_panel.raise_()
+
+    def dump_perf_log(self):
+        try:
+            perf.metrics.dump(self.perf_log)
+        except OSError as e:
+            print(f"Couldn't write performance log {self.perf_log} ({e})", flush=True)
+
+    # Write some or all of the history to a JSONL / CSV / Markdown file (see history.py)
+    def export_history(self):
+        first_day = self.store.next_day_with_data("0000-00-00") or core.today()
+        dialog = HistoryExportDialog(first_day, self)
+        if dialog.exec() != QDialog.Accepted:
+            return
+        format, since, until = dialog.choices()
+        path, _ = QFileDialog.getSaveFileName(self, "Export history", f"littlebits-history.{format}",
+                                              f"{dialog.format_box.currentText()} (*.{format})")
+        if not path:
+            return
+        self.save_notes()  # (so what's being typed right now is in it)
+        QApplication.setOverrideCursor(Qt.WaitCursor)
+        try:
+            count = history.export_file(self.store, path, format, since, until)
+        except OSError as e:
+            QMessageBox.warning(self, "Export history", f"Couldn't write {os.path.basename(path)}:\n{e}")
+            return
+        finally:
+            QApplication.restoreOverrideCursor()
+        print(f"Exported {count} day(s) to {path}", flush=True)
+
+    # Read an export back in; days in the file replace the same days here
+    def import_history(self):
+        path, _ = QFileDialog.getOpenFileName(self, "Import history", "",
+                                              "History exports (*.jsonl *.ndjson *.csv *.md *.markdown)")
+        if not path:
+            return
+        format = history.format_for(path)
+        if format is None:
+            QMessageBox.warning(self, "Import history", "Pick a .jsonl, .csv or .md file exported from Little Bits.")
+            return
+        answer = QMessageBox.question(self, "Import history", "Days in the file will replace the same days here. "
+                                      "Import it?")
+        if answer != QMessageBox.Yes:
+            return
+        self.save_notes()
+        QApplication.setOverrideCursor(Qt.WaitCursor)
+        try:
+            count = history.import_file(self.core, path, format)
+        except history.IMPORT_ERRORS as e:
+            QMessageBox.warning(self, "Import history", f"Couldn't import {os.path.basename(path)}:\n{e}")
+            return
+        finally:
+            QApplication.restoreOverrideCursor()
+        print(f"Imported {count} day(s) from {path}", flush=True)
+        self.update_displayed_date()  # (the day on screen may be one of them)
+
+    @perf.timed("app.update_displayed_date")
     def update_displayed_date(self):
         self.load_lists()
         self.load_notes()
         self.populate_list_widgets()
+        self.prefetch_adjacent_days()
 
         days_difference = (self.display_date - self.current_date).days
 
@@ -302,7 +553,12 @@ class TaskApp(QMainWindow):
             # Default case
             self.date_label.setText(self.display_date.strftime('%A, %B %d, %Y'))
 
-    # Textbox for your notes!
+    # Load the days either side of the displayed one in the background, so ← / → are instant
+    def prefetch_adjacent_days(self):
+        adjacent_days = [self.display_date + datetime.timedelta(days=offset) for offset in (-1, 1)]
+        self.store.prefetch([day.strftime('%Y-%m-%d') for day in adjacent_days])
+
+    # Textbox for your notes! Built the first time the notes view is opened
     def create_notes_view(self):
         self.notes_edit = QTextEdit()
         notes_layout = QVBoxLayout(self.notes_view)
@@ -310,24 +566,35 @@ class TaskApp(QMainWindow):
 
         # If notes exist for today, load them up!
         self.load_notes()
+        self.notes_edit.document().contentsChanged.connect(self.schedule_notes_save)
 
     def create_tasks_view(self):
         tasks_layout = QVBoxLayout(self.tasks_view)
 
         # Right pane: upcoming tasks
         up_next_label = QLabel("Upcoming tasks:")
-        self.up_next_list = TaskList()
+        self.up_next_model = TaskListModel()
+        self.up_next_list = TaskList(self.up_next_model)
+
+        # The task picker follows Up Next one change at a time, rather than re-reading it per pick
+        self.up_next_model.modelReset.connect(self.picker_list_reset)
+        self.up_next_model.rowsInserted.connect(self.picker_rows_added)
+        self.up_next_model.rowsAboutToBeRemoved.connect(self.picker_rows_removing)
 
         # Right pane: add a task (input field and Add Task button)
         add_task_container = QWidget()
         add_task_layout = QHBoxLayout(add_task_container)
 
-        self.new_task_input = QLineEdit()
+        self.new_task_input = TaskInput()
         add_task_button = QPushButton("→")
-        add_task_button.setStyleSheet("padding: 5px; border: 0;")
+        add_task_button.setProperty("plain", True)
+        import_tasks_button = QPushButton("Import…")
+        import_tasks_button.setProperty("plain", True)
+        import_tasks_button.setToolTip("Add every line of a text file, Markdown checklist or CSV file")
 
         add_task_layout.addWidget(self.new_task_input)
         add_task_layout.addWidget(add_task_button)
+        add_task_layout.addWidget(import_tasks_button)
 
         # Enabled drag and drop
         self.up_next_list.setDragDropMode(QAbstractItemView.DragDrop) # can also use InternalMove
@@ -337,7 +604,8 @@ class TaskApp(QMainWindow):
 
         # Right pane: completed tasks
         done_today_label = QLabel("Done so far today:")
-        self.done_today_list = TaskList()
+        self.done_today_model = TaskListModel(done=True)
+        self.done_today_list = TaskList(self.done_today_model)
 
         # Right pane: add objects to layout
         tasks_layout.addWidget(up_next_label)
@@ -346,38 +614,21 @@ class TaskApp(QMainWindow):
         tasks_layout.addWidget(done_today_label)
         tasks_layout.addWidget(self.done_today_list)
 
-        # Apply the stylesheet to your list widgets
-        self.up_next_list.setStyleSheet(list_widget_stylesheet)
-        self.done_today_list.setStyleSheet(list_widget_stylesheet)
-
         # Drag and drop for Done Today
         self.done_today_list.setDragDropMode(QAbstractItemView.DragDrop)
-        self.up_next_list.setDefaultDropAction(Qt.MoveAction) # default is copy, makes a mess of duplicates
+        self.done_today_list.setDefaultDropAction(Qt.MoveAction) # default is copy, makes a mess of duplicates
         self.done_today_list.setDropIndicatorShown(True)
 
         # Right pane: connect button(s) to functions
         self.new_task_input.returnPressed.connect(self.add_task)
+        self.new_task_input.lines_pasted.connect(self.add_pasted_tasks)
         add_task_button.clicked.connect(self.add_task)
-
-        # Right pane: for up_next list items, register enterEvent (hover) and leaveEvent (stop hover)
-        for task in self.up_next:
-            item = QListWidgetItem(task)
-            self.up_next_list.addItem(item)
-
-            # Add hover background color change
-            item.enterEvent = lambda event, item=item: self.hover_enter(item)
-            item.leaveEvent = lambda event, item=item: self.hover_leave(item)
-
-        # Right pane: for done_today list items, register enterEvent (hover) and leaveEvent (stop hover)
-        for task in self.up_next:
-            item = QListWidgetItem(task)
-            self.up_next_list.addItem(item)
-            item.enterEvent = lambda event, item=item: self.hover_enter(item)
-            item.leaveEvent = lambda event, item=item: self.hover_leave(item)
+        import_tasks_button.clicked.connect(self.import_tasks)
 
         # Right pane: handle when list items in Up Next and Done Today are clicked
-        self.up_next_list.itemClicked.connect(self.handle_up_next_item_click)
-        self.done_today_list.itemClicked.connect(self.handle_done_today_item_click)
+        # (hovered items are highlighted by app_stylesheet)
+        self.up_next_list.clicked.connect(self.handle_up_next_item_click)
+        self.done_today_list.clicked.connect(self.handle_done_today_item_click)
 
         # Connect custom signal from TaskList to save_lists method (save list order after drag and drop)
         self.done_today_list.task_dropped.connect(self.save_lists)
@@ -389,44 +640,78 @@ class TaskApp(QMainWindow):
         self.notes_view_button.show()
 
     def switch_to_notes_view(self):
+        if self.notes_edit is None:
+            self.create_notes_view()
         self.stacked_widget.setCurrentIndex(1)
         self.tasks_view_button.show()
         self.notes_view_button.hide()
 
+    def schedule_notes_save(self):
+        # Loading a day's notes also changes the document, but leaves it unmodified
+        if self.notes_edit.document().isModified():
+            self.notes_save_timer.start()
+
+    # Only writes if the user has edited the notes since they were last loaded or saved
+    @perf.timed("app.save_notes")
     def save_notes(self):
+        self.notes_save_timer.stop()
+        if self.notes_edit is None:
+            return  # notes view never opened, so nothing to save
+        document = self.notes_edit.document()
+        if not document.isModified():
+            return
+        document.setModified(False)
+
         notes_content = self.notes_edit.toPlainText()
-        with open("data/notes.json", "r+") as f:
-            data = json.load(f)
-            data[self.display_date.strftime('%Y-%m-%d')] = notes_content
-            f.seek(0)
-            json.dump(data, f, indent=4)
-            f.truncate()
-
-    # Even if you X out of the program without manually saving, and have recent changes
-    # since the last 30-second interval auto-save, your notes will be saved!
+        notes_hash = hashlib.blake2b(notes_content.encode("utf-8"), digest_size=16).digest()
+        if notes_hash == self.notes_hash:
+            return  # edited, but back to what's already saved (e.g. typed then undone)
+        self.notes_hash = notes_hash
+        self.core.save_note(self.display_date.strftime('%Y-%m-%d'), notes_content)
+
+    # Even if you X out of the program before the post-typing auto-save kicks in,
+    # your notes will be saved!
     def save_notes_on_exit(self):
-        notes_content = self.notes_edit.toPlainText()
-        with open("data/notes.json", "r+") as f:
-            data = json.load(f)
-            data[self.display_date.strftime('%Y-%m-%d')] = notes_content
-            f.seek(0)
-            json.dump(data, f, indent=4)
-            f.truncate()
-
-    # Get the correct order of list items for saving
-    def get_list_items(self, list_widget):
-        items = []
-        for index in range(list_widget.count()):
-            items.append(list_widget.item(index).text())
-        return items
-
-    def hover_enter(self, item):
-        item.setBackground(QColor(200, 200, 200))  # Change background color on hover
-
-    def hover_leave(self, item):
-        item.setBackground(QColor(255, 255, 255))  # Restore background color on hover exit
-
-    def handle_up_next_item_click(self, item):
+        self.save_notes()
+        try:
+            self.store.flush()  # saves happen in the background; wait until they're all on disk
+        except storage.SaveError as e:
+            QMessageBox.critical(self, "Couldn't save", f"Some changes couldn't be saved and will be lost:\n{e}")
+
+    # A background save failed; it's kept and retried, but say so (once until it's dismissed)
+    def show_save_error(self, message):
+        if self.save_error_showing:
+            return
+        self.save_error_showing = True
+        QMessageBox.warning(self, "Couldn't save", f"Couldn't save {message}\n\nLittle Bits will keep trying "
+                                                   "while it's open.")
+        self.save_error_showing = False
+
+    # Another process (cli.py, say) changed some days (task_dates / note_dates are sets of dates,
+    # or None for any day): show the displayed day's new lists, and its new notes unless they're
+    # being edited here
+    def reload_changed_days(self, task_dates, note_dates):
+        date = self.display_date.strftime('%Y-%m-%d')
+        # (an earlier day's Up Next may be what rolled over onto this one)
+        if task_dates is None or any(day <= date for day in task_dates):
+            self.load_lists()
+            self.populate_list_widgets()
+        if note_dates is None or date in note_dates:
+            if self.notes_edit is not None and not self.notes_edit.document().isModified():
+                self.load_notes()
+
+    # Runs after save_notes_on_exit: finishes search indexing, stops the save worker and
+    # lets the task journal finish compacting
+    def close_store(self):
+        self.audio.close()
+        try:
+            self.core.close()
+        except storage.SaveError as e:
+            print(f"Closing with unsaved changes: {e}", flush=True)  # (already reported on quit)
+        if self.perf_log:
+            self.dump_perf_log()  # (last, so the final saves are counted)
+
+    def handle_up_next_item_click(self, index):
         menu = QMenu(self)
         mark_done_action = menu.addAction("Mark as Done")
         delete_action = menu.addAction("Delete")
@@ -435,31 +720,22 @@ class TaskApp(QMainWindow):
         action = menu.exec(global_pos)
 
         if action == mark_done_action:
-            self.mark_task_done(item)
+            self.mark_task_done(index)
         elif action == delete_action:
-            self.remove_up_next_item(item)
-
-    def mark_task_done(self, item):
-        task = item.text()
-        self.up_next_list.takeItem(self.up_next_list.row(item))
-        self.up_next.remove(task)
+            self.remove_up_next_item(index)
 
-        # must add to list widget FIRST as they're considered
-        # the master copy of the list. adding to the Python list
-        # will get overwritten in save_lists method
-        self.done_today_list.addItem(task)
-        self.save_lists()              # Update JSON file
-        self.populate_list_widgets()   # Update list widgets
+    # The list models are the master copy of the lists (self.up_next / self.done_today are
+    # their Python lists), so each change is one model call that updates just the affected row
+    def mark_task_done(self, index):
+        task = self.up_next_model.remove(index.row())
+        self.done_today_model.insert_sorted(task.mark_done())
+        self.save_lists()              # Update saved data
 
-    def remove_up_next_item(self, item):
-        task = item.text()
+    def remove_up_next_item(self, index):
+        self.up_next_model.remove(index.row())
+        self.save_lists()              # Update saved data
 
-        self.up_next_list.takeItem(self.up_next_list.row(item))
-        self.up_next.remove(task)
-        self.save_lists()              # Update JSON file
-        self.populate_list_widgets()   # Update list widgets
-
-    def handle_done_today_item_click(self, item):
+    def handle_done_today_item_click(self, index):
         menu = QMenu(self)
 
         edit_action = menu.addAction("Edit")
@@ -469,47 +745,42 @@ class TaskApp(QMainWindow):
         action = menu.exec(global_pos)
 
         if action == edit_action:
-            self.edit_done_today_item(item)
+            self.edit_done_today_item(index)
         elif action == remove_action:
             self.remove_done_today_item()
 
-    def edit_done_today_item(self, item):
-        index = self.done_today_list.row(item)  # Get the index of the clicked item
-        new_text, ok = QInputDialog.getText(self, "Edit Task", "Edit task name:", QLineEdit.Normal, item.text())
+    def edit_done_today_item(self, index):
+        new_text, ok = QInputDialog.getText(self, "Edit Task", "Edit task name:", QLineEdit.Normal, index.data())
 
         if ok and new_text:
-            self.done_today[index] = new_text       # Update the list element's text
-            self.save_lists()                       # Update JSON file
-            self.populate_list_widgets()            # Reload the list widget
+            # Done Today is kept in alphabetical order, so the renamed task may move
+            task = self.done_today_model.remove(index.row())
+            self.done_today_model.insert_sorted(task.replace(title=new_text))
+            self.save_lists()                       # Update saved data
 
     def remove_done_today_item(self):
         # currentIndex() returns a QModelIndex (model item index), not an integer
         selection = self.done_today_list.currentIndex()
-        row = selection.row()
-        data = selection.data()
-
-        # Delete from "Done Today" list widget (GUI)
-        self.done_today_list.takeItem(row)
 
-        # Delete from "Done Today" list (data)
-        self.done_today.remove(data)
+        # Delete from "Done Today" (model and the list view showing it)
+        self.done_today_model.remove(selection.row())
 
-        # Update JSON file
+        # Update saved data
         self.save_lists()
    
+    # Hand a freshly loaded day's lists to the list models (one reset each); from then on
+    # self.up_next / self.done_today are the models' own lists, changed through the models
+    @perf.timed("app.populate_list_widgets")
     def populate_list_widgets(self):
-        self.up_next_list.clear()  # Clear the list widget before adding items
-        for task in self.up_next:
-            self.up_next_list.addItem(task)
-
-        self.done_today_list.clear()  # Clear the list widget before adding items
-        for task in sorted(self.done_today):
-            self.done_today_list.addItem(task)
+        self.up_next_model.set_tasks(self.up_next)
+        self.done_today_model.set_tasks(sorted(self.done_today, key=lambda task: task.title))
+        self.up_next = self.up_next_model.tasks
+        self.done_today = self.done_today_model.tasks
 
     def complete_task(self):
         msg_box = QMessageBox()
         msg_box.setIcon(QMessageBox.Question)
-        msg_box.setText(f"Are you done with: {self.current_task}?")
+        msg_box.setText(f"Are you done with: {self.current_task.title}?")
 
         yes_button = msg_box.addButton("Done", QMessageBox.YesRole)
         more_time_button = msg_box.addButton("More Time", QMessageBox.ActionRole)
@@ -521,10 +792,12 @@ class TaskApp(QMainWindow):
             global have_active_task
 
             self.current_task_label.setText(f"Current Task: ^_^") # Change in-progress task display
-            self.up_next.remove(self.current_task)                # Remove task from Upcoming Tasks list
-            self.done_today.append(self.current_task)             # Add task to Done Today list
-            self.save_lists()                                     # Save updated lists to JSON file
-            self.populate_list_widgets()                          # Update GUI task list Widgets
+            set_style_state(self.current_task_label, "state", "idle")
+            row = self.up_next_model.row_of(self.current_task.id) # (None if it was deleted meanwhile)
+            if row is not None:
+                self.up_next_model.remove(row)                    # Remove task from Upcoming Tasks list
+            self.done_today_model.insert_sorted(self.current_task.mark_done()) # Add task to Done Today list
+            self.save_lists()                                     # Save updated lists
 
             have_active_task = False                              # Switch our busy flag to off
             self.stop_timer()                                     # Stop the QTimer and set self.timer_seconds to 0
@@ -536,7 +809,9 @@ class TaskApp(QMainWindow):
 
         # Task not complete, want to move on for now
         elif msg_box.clickedButton() == skip_button:
+            self.core.record_pick(self.current_task, "skipped")   # (comes up less often for a while)
             have_active_task = False                              # Switch our busy flag to off
+            set_style_state(self.current_task_label, "state", "idle")
             self.stop_timer()                                     # Stop the QTimer and set self.timer_seconds to 0
             self.display_control_buttons()                        # Swap displayed buttons
 
@@ -564,26 +839,43 @@ class TaskApp(QMainWindow):
             self.add_time_button.hide()
             self.pause_timer_button.hide()
 
+    def picker_list_reset(self):
+        self.core.picker.reset(self.up_next_model.tasks)
+
+    def picker_rows_added(self, parent, first, last):
+        self.core.picker.add(self.up_next_model.tasks[first:last + 1])
+
+    def picker_rows_removing(self, parent, first, last):
+        self.core.picker.remove([task.id for task in self.up_next_model.tasks[first:last + 1]])
+
     # Left nav pane option: Get assigned a new task
     def assign_task(self):
         global have_active_task
 
-        # Program will pick a task at random from your to-do list
-        self.current_task = random.choice(self.up_next)
+        # Program will pick a task from your to-do list (current_task is a storage.Task): older
+        # tasks come up more often, ones you've recently said No to less often (see picker.py)
+        task = self.core.pick_task()
+        if task is None:
+            print("No tasks to assign", flush=True)
+            return
+        self.current_task = task
 
         # Instead of a pop-up, I want a wheel that spins or a lotto ball picker, etc.
         msg_box = QMessageBox()
         msg_box.setIcon(QMessageBox.Question)
-        msg_box.setText(f"Do you accept the task: {self.current_task}?")
+        msg_box.setText(f"Do you accept the task: {self.current_task.title}?")
         msg_box.setStandardButtons(QMessageBox.Yes | QMessageBox.No)
         result = msg_box.exec()
+        self.core.record_pick(self.current_task, "accepted" if result == QMessageBox.Yes else "rejected")
 
         if result == QMessageBox.Yes:
             # Set global var to true
             have_active_task = True
 
             # Display assigned task
-            self.current_task_label.setText(f"Current Task: {self.current_task}")
+            self.current_task_label.setText(f"Current Task: {self.current_task.title}")
+            set_style_state(self.current_task_label, "state", "task")
+            self.flash_current_task_label()
 
             # Display task control buttons, hide general menu buttons
             self.display_control_buttons()
@@ -591,187 +883,221 @@ class TaskApp(QMainWindow):
             # Put 15mins on the block, start countdown
             self.start_task_timer()
 
+    # Grow the current task text and turn it green, then ease back
     def flash_current_task_label(self):
-        # Create and start the first animation thread
-        thread1 = threading.Thread(target=self.animate_font_size_thread, args=(18, 24, 'black', 'green'))
-        thread1.start()
-
-        # Wait for the first animation to finish
-        thread1.join()
-        print(f'joined first thread, now shrinking text', flush=True)
-
-        # Start the second animation
-        thread2 = threading.Thread(target=self.animate_font_size_thread, args=(24, 18, 'green', 'black'))
-        thread2.start()
-
-    def animate_font_size_thread(self, start_size, end_size, start_color, end_color):
-        size_range = abs(start_size - end_size)
-        sleep_amt = 0.5
-        self.font_size = start_size
-        for x in range(size_range):
-            if start_size > end_size:
-                print(f"shrinking text from font size: {self.font_size} to {self.font_size - 1}", flush=True)
-                self.font_size -= 1
-                sleep_amt = max(sleep_amt - 0.11, 0.03)
-            else:
-                print(f"enlarging text from font size: {self.font_size} to {self.font_size + 1}", flush=True)
-                self.font_size += 1
-                sleep_amt = max(sleep_amt + 0.11, .9)
-            self.current_task_label.setStyleSheet(f"color: {start_color}; font-size: {self.font_size}px;")
-            time.sleep(sleep_amt)
-        self.current_task_label.setStyleSheet(f"font-size: {end_size}px; color: {end_color};")
+        self.current_task_animator.flash(24, QColor("green"), 1500)
 
     def flash_timer_label(self):
-        self.timer_label.setStyleSheet("color: green; background-color: #D4DFC7; font-size: 24px;")
-
-        self.flash_timer_timer = QTimer(self)
-        self.flash_timer_timer.timeout.connect(self.restore_timer_label)
-        self.flash_timer_timer.start(500)  # Flash for 0.5 seconds
-
-    def restore_timer_label(self):
-        self.timer_label.setStyleSheet("color: black; background-color: #D4DFC7; font-size: 18px")  # Restore original font size
-        self.flash_timer_timer.stop()
+        self.timer_animator.flash(24, QColor("green"), 500)  # Flash for 0.5 seconds
 
     def start_task_timer(self):
         global have_active_task
         
         have_active_task = True
-        self.add_time()
-
-        self.timer = QTimer()
-        self.timer.timeout.connect(self.update_timer)
-        self.timer.start(1000)  # Update every 1 second
-
-    def update_timer(self):
-        global timer_seconds
+        self.timer_engine.start(timer_block_seconds, "task", self.current_task)  # (restarts if already running)
+        self.show_time_added()
 
-        if timer_seconds > 0:
-            timer_seconds -= 1
-            timer = datetime.timedelta(seconds=timer_seconds)
-            self.timer_label.setText(f"{timer}")
-        else:
-            self.timer.stop()
-            self.complete_task() # Ask user if they're done, need more time, etc.
+    # Called by the timer engine only when the displayed time changes
+    def update_timer(self, seconds_left):
+        self.timer_label.setText(f"{datetime.timedelta(seconds=seconds_left)}")
 
     def take_break(self):
         global have_active_task
         have_active_task = True
 
-        self.add_time()
+        self.timer_engine.start(timer_block_seconds, "break")
+        self.show_time_added()
         self.current_task_label.setText("Currently: taking a break")
-
-        self.timer = QTimer()
-        self.timer.timeout.connect(self.update_timer)
-        self.timer.start(1000)  # Update every 1 second
-        #times_up_alert()
+        set_style_state(self.current_task_label, "state", "break")
+        self.display_control_buttons()
 
     def add_time(self):
         global have_active_task
-        global timer_seconds
 
         if have_active_task:
-            # Start with empty hourglass
-            self.hourglass.show_empty_hourglass()
-            # Rotate hourglass
-            self.hourglass.rotate_hourglass()
-
             # Add 15 minutes to the clock
-            timer_seconds += 15 * 60
-            self.timer_label.setText(f"{datetime.timedelta(seconds=timer_seconds)}")
-            winsound.Beep(880, dur)
+            self.timer_engine.extend(timer_block_seconds)
+            self.show_time_added()
+
+    def time_up(self):
+        global have_active_task
+
+        print("\n\tTime\'s up!", flush=True)
+        self.audio.play("times_up")
 
-            # Show the updated time for 3 seconds before starting the countdown
-            QTimer.singleShot(3000, self.update_timer)
-            self.flash_timer_label()
+        if self.timer_engine.kind == "break":
+            # Break's over, back to picking a task
+            have_active_task = False
+            self.current_task_label.setText("Current Task: (button here!)")
+            set_style_state(self.current_task_label, "state", "idle")
+            self.stop_timer()
+            self.display_control_buttons()
+        else:
+            self.complete_task() # Ask user if they're done, need more time, etc.
+
+    def show_time_added(self):
+        # Start with empty hourglass
+        self.hourglass.show_empty_hourglass()
+        # Rotate hourglass
+        self.hourglass.rotate_hourglass()
+
+        self.audio.play("time_added")
+        self.flash_timer_label()
+
+        # Show hourglass as full again
+        QTimer.singleShot(2000, self.hourglass.show_full_hourglass)
+        # 1 second later, show running hourglass image
+        QTimer.singleShot(2500, self.hourglass.show_running_hourglass)
+        QTimer.singleShot(4000, self.hourglass.pulse_hourglass)
+
+    def resume_saved_timer(self):
+        global have_active_task
 
-            # Show hourglass as full again
-            QTimer.singleShot(2000, self.hourglass.show_full_hourglass)
-            # 1 second later, show running hourglass image
-            QTimer.singleShot(2500, self.hourglass.show_running_hourglass)
-            QTimer.singleShot(4000, self.hourglass.pulse_hourglass)
+        kind, task = self.timer_engine.restore()
+        if kind is None:
+            return
+        have_active_task = True
+        if kind == "break":
+            self.current_task_label.setText("Currently: taking a break")
+        else:
+            self.current_task = task
+            self.current_task_label.setText(f"Current Task: {task.title}")
+        set_style_state(self.current_task_label, "state", kind)
+        self.display_control_buttons()
+        self.hourglass.show_running_hourglass()
+        self.show_pause_state()
 
     def add_task(self):
         new_task = self.new_task_input.text()
         if new_task != '':
-            self.up_next.append(new_task)
-            self.up_next_list.addItem(new_task)
+            self.up_next_model.append(Task.new(new_task))
             self.new_task_input.clear()
             self.save_lists()
         else:
             print("Cannot add empty task", flush=True)
 
-    def stop_timer(self):
-        global timer_seconds
+    # Add a batch of Tasks to Up Next with one model update and one save. Titles that are already
+    # on the lists are skipped (see bulk.new_tasks); returns (how many were added, how many skipped).
+    def add_tasks(self, tasks):
+        added, skipped = bulk.new_tasks(tasks, self.up_next + self.done_today)
+        if added:
+            self.up_next_model.extend(added)
+            self.save_lists()
+        return len(added), skipped
+
+    # Several lines pasted into the task box: one task per line
+    def add_pasted_tasks(self, text):
+        added, skipped = self.add_tasks(bulk.parse_lines(text.splitlines(), markdown=True))
+        if skipped:
+            print(f"Skipped {skipped} task(s) already on the list", flush=True)
+
+    def import_tasks(self):
+        path, _ = QFileDialog.getOpenFileName(self, "Import tasks", "", "Task lists (*.txt *.md *.markdown *.csv);;"
+                                              "All files (*)")
+        if not path:
+            return
+        try:
+            added, skipped = self.add_tasks(bulk.read_file(path))  # (read as it's added)
+        except bulk.IMPORT_ERRORS as e:
+            QMessageBox.warning(self, "Import tasks", f"Couldn't read {os.path.basename(path)}:\n{e}")
+            return
+        print(f"Imported {added} task(s) from {path} ({skipped} already on the list)", flush=True)
 
-        self.timer.stop()
-        timer_seconds = 0
+    def stop_timer(self):
+        self.timer_engine.cancel()
+        self.timer_label.setText('00:00')
         self.hourglass.show_empty_hourglass()
+        self.show_pause_state()
 
+    # Pause Timer button: pauses, then resumes
     def pause_timer(self):
-        #self.timer.stop()
-        pass
+        if self.timer_engine.paused:
+            self.timer_engine.resume()
+            self.hourglass.show_running_hourglass()
+        else:
+            self.timer_engine.pause()
+            self.hourglass.show_full_hourglass()
+        self.show_pause_state()
 
-    # Save up_next and done_today listwidget tasks to their Python lists, and to a JSON file
+    def show_pause_state(self):
+        self.pause_timer_button.setText("Resume Timer" if self.timer_engine.paused else "Pause Timer")
+
+    # Save the up_next and done_today lists (kept current by their list models, drag and drop included)
+    @perf.timed("app.save_lists")
     def save_lists(self):
         date = datetime.datetime.now().strftime('%Y-%m-%d')
 
-        # Return widget elements, because they get out of sync with Python lists after drag and drop
-        up_next_items = self.get_list_items(self.up_next_list)
-        done_today_items = self.get_list_items(self.done_today_list)
-
-        # Clear Python lists
-        self.up_next.clear()
-        self.done_today.clear()
-
-        # Update the Python lists
-        self.up_next = up_next_items
-        self.done_today = done_today_items
-
-        # Update the JSON file
-        with open("data/task_lists.json", "r+") as f:
-            data = json.load(f)
-            data[date] = {"up_next": up_next_items, "done_today": done_today_items}
-            #data[date] = {date: {"up_next": up_next_items, "done_today": done_today_items}}
-            f.seek(0)
-            json.dump(data, f, indent=4)
-            f.truncate()
+        # Update today's data (only this one day is written)
+        self.core.save_day(date, self.up_next, self.done_today)
 
+    # (Only once the notes view exists; until then there's nothing to show them in)
+    @perf.timed("app.load_notes")
     def load_notes(self):
+        if self.notes_edit is None:
+            return
         date = self.display_date.strftime('%Y-%m-%d')  # Use the display date
-        try:
-            with open("data/notes.json", "r") as f:
-                data = json.load(f)
-                if date in data:
-                    # Load notes for the current day
-                    todays_data = data[date]
-                    self.notes_edit.setPlainText(todays_data)
-        except FileNotFoundError:
-            pass  # Handle if the notes.json file doesn't exist
-
-    # Load up_next and done_today lists from the JSON file
+        # Load notes for the current day (or clear the box if there aren't any)
+        self.notes_edit.setPlainText(self.core.load_note(date))
+
+        # Remember what was loaded, so save_notes can skip writing it straight back
+        loaded = self.notes_edit.toPlainText()
+        self.notes_hash = hashlib.blake2b(loaded.encode("utf-8"), digest_size=16).digest()
+        self.notes_edit.document().setModified(False)
+
+    # Load up_next and done_today lists for the display date (unfinished tasks roll over from
+    # the most recent earlier day, see core.Session.day)
+    @perf.timed("app.load_lists")
     def load_lists(self):
         date = self.display_date.strftime('%Y-%m-%d')  # Use the display date
-        try:
-            with open("data/task_lists.json", "r") as f:
-                data = json.load(f)
-                if data.get(date):
-                    # Load lists for the current day
-                    todays_data = data[date]
-                    self.up_next = todays_data.get("up_next", [])
-                    self.done_today = todays_data.get("done_today", [])
-                else:
-                    # Look for the most recent existing date with data
-                    existing_dates = sorted(data.keys())
-                    existing_dates.reverse()  # To get the most recent date first
-
-                    for day in existing_dates:
-                        if day < date:
-                            previous_day_data = data[day]
-                            self.up_next = previous_day_data.get("up_next", [])
-                            break
-
-        except FileNotFoundError:
-            pass
+        self.up_next, self.done_today = self.core.day(date)
+
+# Hourglass images, loaded from disk once and shared: {device pixel ratio: {name: pixmap or frames}}.
+# Each picture is drawn centered on a square canvas big enough for it at any angle, pre-scaled
+# for the screen's device pixel ratio, so the Hourglass only ever swaps whole pixmaps.
+hourglass_images = ("hourglass_empty", "hourglass_full", "hourglass")
+hourglass_rotation_frames = 36   # flip animation: one frame per 5 degrees from 0 to 180
+hourglass_pulse_frames = 10      # pulse animation: scale steps from 1 up to hourglass_pulse_scale
+hourglass_pulse_scale = 1.1
+hourglass_pixmaps = {}
+
+def hourglass_pixmap_set(dpr):
+    if dpr not in hourglass_pixmaps:
+        sources = {name: QPixmap(f"assets/{name}.png") for name in hourglass_images}
+        size = sources["hourglass"].size()
+        side = math.ceil(math.hypot(size.width(), size.height()))
+        hourglass_pixmaps[dpr] = {"sources": sources, "side": side}
+    return hourglass_pixmaps[dpr]
+
+# One picture on the shared canvas, rotated and/or scaled about its center
+def render_hourglass_frame(dpr, name, angle=0.0, scale=1.0):
+    pixmaps = hourglass_pixmap_set(dpr)
+    source, side = pixmaps["sources"][name], pixmaps["side"]
+    frame = QPixmap(math.ceil(side * dpr), math.ceil(side * dpr))
+    frame.setDevicePixelRatio(dpr)
+    frame.fill(Qt.transparent)
+    painter = QPainter(frame)
+    painter.setRenderHint(QPainter.SmoothPixmapTransform)
+    painter.translate(side / 2, side / 2)
+    painter.rotate(angle)
+    painter.scale(scale, scale)
+    painter.drawPixmap(QPointF(-source.width() / 2, -source.height() / 2), source)
+    painter.end()
+    return frame
+
+# A picture (key "hourglass_full" etc.) or an animation's list of frames (key "rotation" /
+# "pulse"), rendered the first time anything asks for it
+def hourglass_frames(dpr, key):
+    pixmaps = hourglass_pixmap_set(dpr)
+    if key not in pixmaps:
+        if key == "rotation":
+            pixmaps[key] = [render_hourglass_frame(dpr, "hourglass_empty", angle=180 * step / hourglass_rotation_frames)
+                            for step in range(hourglass_rotation_frames + 1)]
+        elif key == "pulse":
+            pixmaps[key] = [render_hourglass_frame(dpr, "hourglass", scale=1 + (hourglass_pulse_scale - 1) * step / hourglass_pulse_frames)
+                            for step in range(hourglass_pulse_frames + 1)]
+        else:
+            pixmaps[key] = render_hourglass_frame(dpr, key)
+    return pixmaps[key]
 
 class Hourglass(QGraphicsView):
     def __init__(self):
@@ -780,27 +1106,29 @@ class Hourglass(QGraphicsView):
         self.setFixedSize(QSize(105, 141))  # Can adjust rect size here
         self.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
         self.setVerticalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
-        self.setStyleSheet("border: 0; background-color: #D4DFC7;")
+        self.setObjectName("hourglass")
 
         # Create a QGraphicsScene
         scene = QGraphicsScene(self)
         self.setScene(scene)
 
-        # Load the hourglass pixmaps
-        self.hourglass_empty_pixmap = QPixmap("assets/hourglass_empty.png")
-        self.hourglass_full_pixmap = QPixmap("assets/hourglass_full.png")
-        self.hourglass_pixmap = QPixmap("assets/hourglass.png")
+        # Shared hourglass pixmaps, pre-scaled for the sharpest screen
+        self.dpr = QApplication.instance().devicePixelRatio()
+        side = hourglass_pixmap_set(self.dpr)["side"]
+        scene.setSceneRect(0, 0, side, side)  # (every frame is the same size, so nothing shifts)
 
         # Create QGraphicsPixmapItems
-        self.hourglass_empty_item = scene.addPixmap(self.hourglass_empty_pixmap)
-        self.hourglass_full_item = scene.addPixmap(self.hourglass_full_pixmap)
-        self.hourglass_item = scene.addPixmap(self.hourglass_pixmap)
+        self.hourglass_empty_item = scene.addPixmap(hourglass_frames(self.dpr, "hourglass_empty"))
+        self.hourglass_full_item = scene.addPixmap(hourglass_frames(self.dpr, "hourglass_full"))
+        self.hourglass_item = scene.addPixmap(hourglass_frames(self.dpr, "hourglass"))
 
         # Set default opacity
         self.hourglass_full_item.setOpacity(0)  # Start with full hourglass hidden
         self.hourglass_item.setOpacity(0)  # Start with running hourglass also hidden
 
         self._rotation = 0
+        self.rotation_frame = 0
+        self.pulse_frame = 0
 
     @Property(float)
     def rotation(self):
@@ -810,19 +1138,24 @@ class Hourglass(QGraphicsView):
     def scale_factor(self):
         return self._scale_factor
 
+    # Animation frames are just a pixmap swap, and only when the frame actually changes
     @rotation.setter
+    @perf.timed("animation.hourglass_frame")
     def rotation(self, angle):
         self._rotation = angle
-        transform = QTransform()
-        transform.translate(self.hourglass_empty_item.pixmap().width() / 2, self.hourglass_empty_item.pixmap().height() / 2)
-        transform.rotate(self._rotation)
-        transform.translate(-self.hourglass_empty_item.pixmap().width() / 2, -self.hourglass_empty_item.pixmap().height() / 2)
-        self.hourglass_empty_item.setTransform(transform)
+        frame = round(angle / 180 * hourglass_rotation_frames)
+        if frame != self.rotation_frame:
+            self.rotation_frame = frame
+            self.hourglass_empty_item.setPixmap(hourglass_frames(self.dpr, "rotation")[frame])
 
     @scale_factor.setter
+    @perf.timed("animation.hourglass_frame")
     def scale_factor(self, value):
         self._scale_factor = value
-        self.hourglass_item.setScale(self._scale_factor)
+        frame = round((value - 1) / (hourglass_pulse_scale - 1) * hourglass_pulse_frames)
+        if frame != self.pulse_frame:
+            self.pulse_frame = frame
+            self.hourglass_item.setPixmap(hourglass_frames(self.dpr, "pulse")[frame])
 
     def rotate_hourglass(self):
         self.animation = QPropertyAnimation(self, b'rotation')
@@ -847,35 +1180,552 @@ class Hourglass(QGraphicsView):
         self.hourglass_item.setOpacity(0)
 
     def pulse_hourglass(self):
-        pass
-        #print(f'pulse', flush=True)
-        # pulse_animation = QPropertyAnimation(self.hourglass_item, b'scale')
-        # pulse_animation.setDuration(1000)  # Duration in milliseconds
-        # pulse_animation.setKeyValueAt(0, 1)
-        # pulse_animation.setKeyValueAt(0.5, 1.1)  # Scale up to 10% larger
-        # pulse_animation.setKeyValueAt(1, 1)
-        # pulse_animation.setLoopCount(1)
-        # pulse_animation.start()
-
-# Custom subclass to override default dropEvent method of QListWidget,
-# to allow users to save their task list orders properly (to Python list and JSON save file)
-# Also emits signal to call save_lists method in parent app
-class TaskList(QListWidget):
-    task_dropped = Signal()
+        self.pulse_animation = QPropertyAnimation(self, b'scale_factor')
+        self.pulse_animation.setDuration(1000)  # Duration in milliseconds
+        self.pulse_animation.setKeyValueAt(0, 1.0)
+        self.pulse_animation.setKeyValueAt(0.5, hourglass_pulse_scale)  # Scale up to 10% larger
+        self.pulse_animation.setKeyValueAt(1, 1.0)
+        self.pulse_animation.start()
+
+# Animates a label's text size and color on the event loop (one reusable QVariantAnimation per
+# label, no threads). The animation runs an "intensity" from 0 (resting size/color) to 1 (peak);
+# each frame sets the label's font and palette directly, which is far cheaper than re-parsing a
+# stylesheet, and frames are dropped past animation_max_fps or when nothing visible changed.
+# Flashing again while a flash is still running carries on from the current intensity instead
+# of starting a second animation, so overlapping flashes merge into one.
+class LabelAnimator(QObject):
+    def __init__(self, label, size, color, parent=None):
+        super().__init__(parent or label)
+        self.label = label
+        self.rest_size, self.rest_color = size, color
+        self.peak_size, self.peak_color = size, color
+        self.shown = None  # (pixel size, color rgba) currently applied
+        self.frame_clock = QElapsedTimer()
+        self.animation = QVariantAnimation(self)
+        self.animation.setEasingCurve(QEasingCurve.InOutQuad)
+        self.animation.valueChanged.connect(self.frame)
+        self.animation.finished.connect(self.finished)
+        self.apply(0.0)
+
+    def flash(self, peak_size, peak_color, duration_ms):
+        intensity = self.animation.currentValue() if self.animation.state() == QAbstractAnimation.Running else 0.0
+        self.animation.stop()
+        self.peak_size, self.peak_color = peak_size, peak_color
+        # Rise quickly, hold, then ease back down
+        self.animation.setDuration(duration_ms)
+        self.animation.setKeyValueAt(0.0, float(intensity))
+        self.animation.setKeyValueAt(0.2, 1.0)
+        self.animation.setKeyValueAt(0.7, 1.0)
+        self.animation.setKeyValueAt(1.0, 0.0)
+        self.frame_clock.invalidate()
+        set_style_state(self.label, "flashing", True)  # (app_stylesheet may style flashing labels)
+        self.animation.start()
+
+    def finished(self):
+        self.apply(0.0)
+        set_style_state(self.label, "flashing", False)
+
+    @perf.timed("animation.label_frame")
+    def frame(self, intensity):
+        if self.frame_clock.isValid() and self.frame_clock.elapsed() < 1000 / animation_max_fps:
+            return
+        self.frame_clock.start()
+        self.apply(intensity)
+
+    def apply(self, intensity):
+        size = round(self.rest_size + (self.peak_size - self.rest_size) * intensity)
+        color = QColor.fromRgbF(*(rest + (peak - rest) * intensity for rest, peak in
+                                  zip(self.rest_color.getRgbF(), self.peak_color.getRgbF())))
+        if (size, color.rgba()) == self.shown:
+            return
+        self.shown = (size, color.rgba())
+        font = self.label.font()
+        font.setPixelSize(size)
+        self.label.setFont(font)
+        palette = self.label.palette()
+        palette.setColor(QPalette.WindowText, color)
+        self.label.setPalette(palette)
+
+# Countdown for the current task or break, kept as a deadline on the monotonic clock (so it can't
+# drift or run fast, however busy the event loop gets) instead of counting ticks. A single
+# single-shot QTimer wakes up only when the displayed whole second changes and emits
+# tick(seconds_left); expired() is emitted once the deadline passes.
+# Every state change (start/extend/pause/resume/cancel) is checkpointed to a small JSON file,
+# with the deadline as wall-clock time, so restore() can pick the session up after a restart.
+class TimerEngine(QObject):
+    tick = Signal(int)
+    expired = Signal()
+
+    def __init__(self, state_path, parent=None):
+        super().__init__(parent)
+        self.state_path = state_path
+        self.kind = None          # "task" or "break" while a session is on, else None
+        self.task = None          # the Task being worked on, for kind "task"
+        self.deadline = None      # time.monotonic() value when time runs out (while running)
+        self.paused_left = None   # seconds left (while paused)
+        self.due = None           # time.monotonic() value the timer was asked to fire at
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setTimerType(Qt.PreciseTimer)
+        self.timer.timeout.connect(self.timer_fired)
+
+    @property
+    def active(self):
+        return self.kind is not None
+
+    @property
+    def paused(self):
+        return self.paused_left is not None
+
+    def seconds_left(self):
+        if self.paused:
+            return self.paused_left
+        if self.deadline is None:
+            return 0
+        return max(self.deadline - time.monotonic(), 0)
+
+    def start(self, seconds, kind, task=None):
+        self.kind, self.task = kind, task
+        self.deadline = time.monotonic() + seconds
+        self.paused_left = None
+        self.checkpoint()
+        self.wake()
+
+    def extend(self, seconds):
+        if not self.active:
+            return
+        if self.paused:
+            self.paused_left += seconds
+            self.tick.emit(math.ceil(self.paused_left))
+        else:
+            self.deadline += seconds
+        self.checkpoint()
+        self.wake()
+
+    def pause(self):
+        if not self.active or self.paused:
+            return
+        self.paused_left = self.seconds_left()
+        self.deadline = None
+        self.timer.stop()
+        self.checkpoint()
+
+    def resume(self):
+        if not self.paused:
+            return
+        self.deadline = time.monotonic() + self.paused_left
+        self.paused_left = None
+        self.checkpoint()
+        self.wake()
+
+    def cancel(self):
+        self.timer.stop()
+        self.kind = self.task = self.deadline = self.paused_left = None
+        if os.path.exists(self.state_path):
+            os.remove(self.state_path)
+
+    # (how late the wake-up came is recorded as "timer.lateness")
+    def timer_fired(self):
+        perf.metrics.record("timer.lateness", max(time.monotonic() - self.due, 0))
+        self.wake()
+
+    # Show the current value, then sleep until it's due to change (or until time's up)
+    @perf.timed("timer.wake")
+    def wake(self):
+        if not self.active or self.paused:
+            return
+        left = self.deadline - time.monotonic()
+        if left <= 0:
+            self.timer.stop()
+            self.deadline = time.monotonic()  # stays at 00:00 until the session is restarted or cancelled
+            self.tick.emit(0)
+            self.expired.emit()
+            return
+        shown = math.ceil(left)
+        self.tick.emit(shown)
+        interval_ms = math.ceil((left - (shown - 1)) * 1000)
+        self.due = time.monotonic() + interval_ms / 1000
+        self.timer.start(interval_ms)
+
+    def checkpoint(self):
+        state = {"kind": self.kind, "task": self.task}
+        if self.paused:
+            state["paused_left"] = self.paused_left
+        else:
+            state["deadline"] = time.time() + self.seconds_left()
+        storage.write_text(self.state_path, json.dumps(state, default=storage.task_json))
+
+    # Load the checkpoint left by a previous run; returns (kind, task), or (None, None) if
+    # nothing was running. Time that passed while the app was closed still counts.
+    def restore(self):
+        text = storage.read_text(self.state_path)
+        if text is None:
+            return None, None
+        try:
+            state = json.loads(text)
+            kind = state["kind"]
+            task = Task.from_json(state["task"], "restored") if state.get("task") else None
+            if "paused_left" in state:
+                self.kind, self.task, self.deadline, self.paused_left = kind, task, None, state["paused_left"]
+                self.tick.emit(math.ceil(self.paused_left))
+            else:
+                left = state["deadline"] - time.time()
+                self.kind, self.task, self.deadline, self.paused_left = kind, task, time.monotonic() + left, None
+                QTimer.singleShot(0, self.wake)  # (once the event loop is running, in case it's already expired)
+        except (ValueError, KeyError, TypeError):
+            print(f"Ignoring unreadable timer state in {self.state_path}", flush=True)
+            self.cancel()
+            return None, None
+        return kind, task
+
+# The new-task box. A paste (or drop) of several lines is handed to lines_pasted instead, so
+# each line becomes a task; a plain QLineEdit would squash them into one long title.
+class TaskInput(QLineEdit):
+    lines_pasted = Signal(str)
+
+    def keyPressEvent(self, event):
+        if event.matches(QKeySequence.Paste) and self.paste_lines(QApplication.clipboard().text()):
+            return
+        super().keyPressEvent(event)
+
+    # The usual right-click menu, with Paste going through paste_lines too
+    def contextMenuEvent(self, event):
+        menu = self.createStandardContextMenu()
+        for action in menu.actions():
+            if action.objectName() == "edit-paste":
+                action.triggered.disconnect()
+                action.triggered.connect(self.paste_from_menu)
+        menu.exec(event.globalPos())
+        menu.deleteLater()
+
+    def paste_from_menu(self):
+        if not self.paste_lines(QApplication.clipboard().text()):
+            self.paste()
 
     def dropEvent(self, event):
+        if event.mimeData().hasText() and self.paste_lines(event.mimeData().text()):
+            event.acceptProposedAction()
+            return
         super().dropEvent(event)
+
+    def paste_lines(self, text):
+        if "\n" not in text.strip():
+            return False
+        self.lines_pasted.emit(text)
+        return True
+
+# List model over a plain Python list of Tasks. Every change goes through a method that
+# tells attached views exactly which rows changed (rowsInserted / rowsRemoved / rowsMoved /
+# dataChanged), so an edit touches one row instead of rebuilding the whole list.
+# Drag and drop is implemented here too: reordering within a list is a moveRows, dragging
+# between the two lists inserts into the target and removes from the source.
+class TaskListModel(QAbstractListModel):
+    mime_type = "application/x-littlebits-tasks"
+
+    # done: this is a Done Today list (see dropMimeData)
+    def __init__(self, tasks=None, parent=None, done=False):
+        super().__init__(parent)
+        self.tasks = list(tasks or [])
+        self.done = done
+        self.rows = {}  # task id -> row it was last seen at (checked before use, see row_of)
+
+    def set_tasks(self, tasks):
+        self.beginResetModel()
+        self.tasks = list(tasks)
+        self.rows = {task.id: row for row, task in enumerate(self.tasks)}
+        self.endResetModel()
+
+    # Row of the task with this id, or None. The remembered row is right unless rows above it have
+    # come or gone since, which is checked in O(1); only then are the rows re-indexed.
+    def row_of(self, task_id):
+        row = self.rows.get(task_id)
+        if row is None or row >= len(self.tasks) or self.tasks[row].id != task_id:
+            self.rows = {task.id: row for row, task in enumerate(self.tasks)}
+            row = self.rows.get(task_id)
+        return row
+
+    def insert(self, row, task):
+        self.beginInsertRows(QModelIndex(), row, row)
+        self.tasks.insert(row, task)
+        self.rows[task.id] = row
+        self.endInsertRows()
+
+    def append(self, task):
+        self.insert(len(self.tasks), task)
+
+    # Append several tasks as one change (one rowsInserted for the lot)
+    def extend(self, tasks):
+        if not tasks:
+            return
+        first = len(self.tasks)
+        self.beginInsertRows(QModelIndex(), first, first + len(tasks) - 1)
+        self.tasks.extend(tasks)
+        self.rows.update((task.id, row) for row, task in enumerate(tasks, first))
+        self.endInsertRows()
+
+    # Insert into a list sorted by title, keeping it sorted
+    def insert_sorted(self, task):
+        self.insert(bisect.bisect_right(self.tasks, task.title, key=lambda task: task.title), task)
+
+    def remove(self, row):
+        self.beginRemoveRows(QModelIndex(), row, row)
+        task = self.tasks.pop(row)
+        self.endRemoveRows()
+        return task
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.tasks)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if index.isValid() and role in (Qt.DisplayRole, Qt.EditRole):
+            return self.tasks[index.row()].title
+        return None
+
+    def flags(self, index):
+        if not index.isValid():
+            return Qt.ItemIsDropEnabled  # drops land between items, never on top of one
+        return Qt.ItemIsEnabled | Qt.ItemIsSelectable | Qt.ItemIsDragEnabled
+
+    def supportedDragActions(self):
+        return Qt.MoveAction
+
+    def supportedDropActions(self):
+        return Qt.MoveAction
+
+    def mimeTypes(self):
+        return [self.mime_type]
+
+    def mimeData(self, indexes):
+        rows = sorted(index.row() for index in indexes)
+        mime_data = QMimeData()
+        tasks = [self.tasks[row].to_json() for row in rows]
+        mime_data.setData(self.mime_type, json.dumps(tasks).encode("utf-8"))
+        return mime_data
+
+    # A drop from the other list; the list it came from removes the rows once the drop is done
+    def dropMimeData(self, mime_data, action, row, column, parent):
+        if action != Qt.MoveAction or not mime_data.hasFormat(self.mime_type):
+            return False
+        tasks = [Task.from_json(value, None) for value in json.loads(bytes(mime_data.data(self.mime_type)).decode("utf-8"))]
+        if self.done:
+            # Same as Mark as Done: stamped with when it was done and filed in title order
+            for task in tasks:
+                self.insert_sorted(task if task.completed else task.mark_done())
+            return True
+        tasks = [task.replace(completed=None) if task.completed else task for task in tasks]  # not done any more
+        if row < 0:
+            row = parent.row() if parent.isValid() else len(self.tasks)
+        self.beginInsertRows(QModelIndex(), row, row + len(tasks) - 1)
+        self.tasks[row:row] = tasks
+        self.endInsertRows()
+        return True
+
+    def removeRows(self, row, count, parent=QModelIndex()):
+        if parent.isValid() or row < 0 or row + count > len(self.tasks):
+            return False
+        self.beginRemoveRows(QModelIndex(), row, row + count - 1)
+        del self.tasks[row:row + count]
+        self.endRemoveRows()
+        return True
+
+    # Used by QListView for drag and drop reordering within the same list
+    def moveRows(self, source_parent, source_row, count, destination_parent, destination_row):
+        if source_parent.isValid() or destination_parent.isValid():
+            return False
+        if not self.beginMoveRows(QModelIndex(), source_row, source_row + count - 1, QModelIndex(), destination_row):
+            return False  # moving rows onto themselves
+        moved = self.tasks[source_row:source_row + count]
+        del self.tasks[source_row:source_row + count]
+        if destination_row > source_row:
+            destination_row -= count
+        self.tasks[destination_row:destination_row] = moved
+        self.endMoveRows()
+        return True
+
+
+# List view for a TaskListModel. Emits task_dropped once a drag that started here is over
+# (whether it was reordered within this list or dropped into the other one), by which time
+# both lists' models are up to date, so the parent app can call save_lists
+class TaskList(QListView):
+    task_dropped = Signal()
+
+    def __init__(self, model):
+        super().__init__()
+        self.setModel(model)
+        self.setSelectionMode(QAbstractItemView.SingleSelection)
+
+    def startDrag(self, supported_actions):
+        super().startDrag(supported_actions)
         self.task_dropped.emit()
 
+# Search box with results listed as you type. Choosing a result emits hit_chosen(kind, date)
+class SearchDialog(QDialog):
+    hit_chosen = Signal(str, str)
+
+    def __init__(self, index, parent=None):
+        super().__init__(parent)
+        self.index = index
+        self.hits = []
+        self.setWindowTitle("Search")
+        self.resize(420, 360)
+
+        layout = QVBoxLayout(self)
+        self.query_input = QLineEdit()
+        self.query_input.setPlaceholderText('words, prefix*, "exact phrase"')
+        self.results_list = QListWidget()
+        layout.addWidget(self.query_input)
+        layout.addWidget(self.results_list)
+
+        # Search once typing pauses briefly, not on every keystroke
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(150)
+        self.search_timer.timeout.connect(self.run_search)
+        self.query_input.textChanged.connect(self.search_timer.start)
+        self.query_input.returnPressed.connect(self.choose_first_hit)
+        self.results_list.itemActivated.connect(self.choose_hit)
+
+    @perf.timed("search.query")
+    def run_search(self):
+        self.hits = self.index.search(self.query_input.text())
+        self.results_list.clear()
+        for hit in self.hits:
+            day = datetime.date.fromisoformat(hit.date).strftime('%a, %b %d, %Y')
+            if hit.kind == "note":
+                self.results_list.addItem(f"{day} — notes")
+            else:
+                self.results_list.addItem(f"{day} — {hit.title}")
+
+    def choose_first_hit(self):
+        self.search_timer.stop()
+        self.run_search()
+        if self.hits:
+            self.results_list.setCurrentRow(0)
+            self.choose_hit(self.results_list.item(0))
+
+    def choose_hit(self, item):
+        hit = self.hits[self.results_list.row(item)]
+        self.hit_chosen.emit(hit.kind, hit.date)
+
+# How late the event loop gets round to timers: a timer asks to fire every lag_probe_interval_ms,
+# and however much later than that it actually fires is recorded as "event_loop.lag". It wakes
+# the app up 10 times a second, so it only runs while something is watching (the debug panel,
+# or $LITTLEBITS_PERF_LOG); start() / stop() calls are counted.
+lag_probe_interval_ms = 100
+
+class EventLoopLagMonitor(QObject):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.watchers = 0
+        self.last = None
+        self.timer = QTimer(self)
+        self.timer.setTimerType(Qt.PreciseTimer)
+        self.timer.setInterval(lag_probe_interval_ms)
+        self.timer.timeout.connect(self.probe)
+
+    def start(self):
+        self.watchers += 1
+        if self.watchers == 1:
+            self.last = time.perf_counter()
+            self.timer.start()
+
+    def stop(self):
+        self.watchers -= 1
+        if self.watchers == 0:
+            self.timer.stop()
+
+    def probe(self):
+        now = time.perf_counter()
+        perf.metrics.record("event_loop.lag", max(now - self.last - lag_probe_interval_ms / 1000, 0))
+        self.last = now
+
+# Options for History > Export: which format, and which days (from the first day with data to today)
+class HistoryExportDialog(QDialog):
+    format_names = {"jsonl": "JSON Lines", "csv": "CSV", "md": "Markdown"}
+
+    def __init__(self, first_day, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Export history")
+
+        layout = QFormLayout(self)
+        self.format_box = QComboBox()
+        for format in history.FORMATS:
+            self.format_box.addItem(self.format_names[format], format)
+        self.since_edit = QDateEdit(QDate.fromString(first_day, Qt.ISODate))
+        self.until_edit = QDateEdit(QDate.currentDate())
+        for date_edit in (self.since_edit, self.until_edit):
+            date_edit.setCalendarPopup(True)
+            date_edit.setDisplayFormat("yyyy-MM-dd")
+        buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+        layout.addRow("Format:", self.format_box)
+        layout.addRow("From:", self.since_edit)
+        layout.addRow("To:", self.until_edit)
+        layout.addRow(buttons)
+
+    # (format, since, until) with the dates as 'YYYY-MM-DD'
+    def choices(self):
+        return (self.format_box.currentData(), self.since_edit.date().toString(Qt.ISODate),
+                self.until_edit.date().toString(Qt.ISODate))
+
+# Hidden debug panel (Ctrl+Shift+D): the perf.metrics table, refreshed every second while it's open
+class PerfPanel(QDialog):
+    def __init__(self, lag_monitor, parent=None):
+        super().__init__(parent)
+        self.lag_monitor = lag_monitor
+        self.setWindowTitle("Performance")
+        self.resize(760, 420)
+
+        layout = QVBoxLayout(self)
+        self.table = QPlainTextEdit()
+        self.table.setReadOnly(True)
+        self.table.setLineWrapMode(QPlainTextEdit.NoWrap)
+        self.table.setFont(QFontDatabase.systemFont(QFontDatabase.FixedFont))
+        reset_button = QPushButton("Reset")
+        reset_button.setProperty("plain", True)
+        reset_button.clicked.connect(self.reset)
+        layout.addWidget(self.table)
+        layout.addWidget(reset_button)
+
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.setInterval(1000)
+        self.refresh_timer.timeout.connect(self.refresh)
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.refresh()
+        self.refresh_timer.start()
+        self.lag_monitor.start()
+
+    def hideEvent(self, event):
+        super().hideEvent(event)
+        self.refresh_timer.stop()
+        self.lag_monitor.stop()
+
+    def refresh(self):
+        self.table.setPlainText(perf.metrics.report())
+
+    def reset(self):
+        perf.metrics.reset()
+        self.refresh()
+
 if __name__ == "__main__":
+    # --profile-startup prints how long each part of startup took
+    if "--profile-startup" in sys.argv:
+        sys.argv.remove("--profile-startup")
+        startup_profile.enabled = True
+    startup_profile.mark("imports")
+
     app = QApplication(sys.argv)
-    window = TaskApp()
-    window.show()
+    # Set the custom font as the default font for the application (needs the QApplication to exist)
+    app.setFont(QFont(font_family, font_size))
+    startup_profile.mark("QApplication")
 
-    # global stylesheet for app
-    padding_top = 2  # Adjust as needed
-    padding_bottom = 2  # Adjust as needed
-    app.setStyleSheet(f"* {{ padding-top: {padding_top}px; padding-bottom: {padding_bottom}px; }}")
+    # global stylesheet for app (set before the window is built, so it's styled once rather than twice)
+    app.setStyleSheet(app_stylesheet)
 
+    window = TaskApp()
+    window.show()
 
-    sys.exit(app.exec())
\ No newline at end of file
+    sys.exit(app.exec())
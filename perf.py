@@ -0,0 +1,138 @@
+import bisect
+import datetime
+import functools
+import json
+import os
+import threading
+import time
+
+# Set to a file path to have the app append a snapshot of every metric to it (one JSON object
+# per line) every PERF_LOG_INTERVAL_MS, and once more when it quits
+PERF_LOG_ENV_VAR = "LITTLEBITS_PERF_LOG"
+PERF_LOG_INTERVAL_MS = 10_000
+
+# Latency histogram buckets: upper bounds in ms (the last bucket is everything slower)
+BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+
+# Size of some text once it's UTF-8 encoded (without encoding it, if it's plain ASCII)
+def text_bytes(text):
+    return len(text) if text.isascii() else len(text.encode("utf-8"))
+
+
+# One instrumented operation: how often it ran, how long it took (total, max and a histogram),
+# and how much data it read / wrote
+class Metric:
+    __slots__ = ("count", "total", "max", "buckets", "bytes_read", "bytes_written")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * (len(BUCKETS_MS) + 1)
+        self.bytes_read = 0
+        self.bytes_written = 0
+
+    def to_json(self):
+        return {
+            "count": self.count,
+            "total_ms": round(self.total * 1000, 3),
+            "mean_ms": round(self.total * 1000 / self.count, 3) if self.count else 0.0,
+            "max_ms": round(self.max * 1000, 3),
+            "histogram": dict(zip([f"<={bound}ms" for bound in BUCKETS_MS] + [f">{BUCKETS_MS[-1]}ms"], self.buckets)),
+            "bytes_read": self.bytes_read,
+            "bytes_written": self.bytes_written,
+        }
+
+
+# Times a block and records it on the way out; set bytes_read / bytes_written inside the block
+class Span:
+    __slots__ = ("metrics", "name", "started", "bytes_read", "bytes_written")
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+        self.bytes_read = 0
+        self.bytes_written = 0
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.metrics.record(self.name, time.perf_counter() - self.started, self.bytes_read, self.bytes_written)
+
+
+# Counters for the app's hot paths, by name ("storage.read_tasks", "app.load_lists", ...).
+# Cheap enough to leave on all the time: recording is a couple of additions under a lock
+# (saves and prefetches record from worker threads).
+class Metrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.metrics = {}
+        self.started = time.time()
+
+    def record(self, name, seconds, bytes_read=0, bytes_written=0):
+        with self.lock:
+            metric = self.metrics.get(name)
+            if metric is None:
+                metric = self.metrics[name] = Metric()
+            metric.count += 1
+            metric.total += seconds
+            if seconds > metric.max:
+                metric.max = seconds
+            metric.buckets[bisect.bisect_left(BUCKETS_MS, seconds * 1000)] += 1
+            metric.bytes_read += bytes_read
+            metric.bytes_written += bytes_written
+
+    def span(self, name):
+        return Span(self, name)
+
+    # Decorator: time every call of a function
+    def timed(self, name):
+        def decorator(function):
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return function(*args, **kwargs)
+                finally:
+                    self.record(name, time.perf_counter() - started)
+            return wrapper
+        return decorator
+
+    def snapshot(self):
+        with self.lock:
+            return {name: metric.to_json() for name, metric in sorted(self.metrics.items())}
+
+    def reset(self):
+        with self.lock:
+            self.metrics.clear()
+            self.started = time.time()
+
+    # A fixed-width table of everything recorded so far, slowest total first
+    def report(self):
+        rows = sorted(self.snapshot().items(), key=lambda item: item[1]["total_ms"], reverse=True)
+        lines = [f"{'metric':<28}{'count':>8}{'mean ms':>10}{'max ms':>10}{'total ms':>11}{'read KB':>10}{'written KB':>11}"]
+        for name, metric in rows:
+            lines.append(f"{name:<28}{metric['count']:>8}{metric['mean_ms']:>10.3f}{metric['max_ms']:>10.3f}"
+                         f"{metric['total_ms']:>11.1f}{metric['bytes_read'] / 1024:>10.1f}"
+                         f"{metric['bytes_written'] / 1024:>11.1f}")
+        return "\n".join(lines)
+
+    # Add one line with the current totals to a JSONL file
+    def dump(self, path):
+        line = {
+            "time": datetime.datetime.now().isoformat(timespec="seconds"),
+            "uptime_s": round(time.time() - self.started, 1),
+            "pid": os.getpid(),
+            "metrics": self.snapshot(),
+        }
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(line) + "\n")
+
+
+# The one set of metrics everything records into
+metrics = Metrics()
+span = metrics.span
+timed = metrics.timed
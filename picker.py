@@ -0,0 +1,230 @@
+import datetime
+import functools
+import json
+import random
+import time
+
+import storage
+
+PICK_STATS_FILE = "pick_stats.json"
+
+# How likely a task is to be picked is its weight: priority x age x recent-rejection penalty.
+#   priority: task.meta["priority"] if it's a number (1 = normal, 2 = twice as likely, ...)
+#   age:      grows with the days since the task was added, so old tasks don't sit there forever
+#   penalty:  every "No" when it's offered (and every "Skip" once it's running) makes it less likely
+#             for a while; they fade out with a half-life, so nothing is buried for good
+AGE_DOUBLING_DAYS = 14   # a task this many days old is twice as likely as a new one...
+MAX_AGE_FACTOR = 4.0     # ...up to this many times as likely
+REJECT_PENALTY = 2.0     # one fresh "No" makes a task 1 / (1 + 2) as likely
+SKIP_PENALTY = 1.0       # one fresh "Skip" makes it 1 / (1 + 1) as likely
+PENALTY_HALF_LIFE_DAYS = 2
+STATS_KEEP_DAYS = 90     # stats for tasks not offered in this long are dropped
+STATS_SAVE_SECONDS = 60  # outcomes are written out at most this often (and by save(), on close)
+
+# The alias table is rebuilt once this many tasks were added since it was built, once less than
+# half of its weight still belongs to tasks in the list, or once it's this old (penalties fade
+# over time, which the table doesn't see)
+MAX_PENDING = 32
+MAX_TABLE_AGE_SECONDS = 3600
+MAX_TRIES = 64
+
+
+# (Tasks added on the same day share a created date, so this is mostly cache hits)
+@functools.lru_cache(maxsize=4096)
+def age_factor(created, today):
+    try:
+        age = (today - datetime.date.fromisoformat(created)).days
+    except ValueError:
+        return 1.0
+    return min(1 + max(age, 0) / AGE_DOUBLING_DAYS, MAX_AGE_FACTOR)
+
+
+# Vose's alias method: from weights, (probability, alias) per slot so a weighted sample is one
+# uniform slot choice plus one coin flip
+def alias_table(weights):
+    count = len(weights)
+    total = sum(weights)
+    scaled = [weight * count / total for weight in weights]
+    probability, alias = [1.0] * count, list(range(count))
+    small = [i for i, value in enumerate(scaled) if value < 1]
+    large = [i for i, value in enumerate(scaled) if value >= 1]
+    while small and large:
+        less, more = small.pop(), large.pop()
+        probability[less], alias[less] = scaled[less], more
+        scaled[more] -= 1 - scaled[less]
+        (small if scaled[more] < 1 else large).append(more)
+    return probability, alias
+
+
+# Picks the next task to work on from Up Next, weighted (see above), in O(1) per pick.
+#
+# The list is mirrored with reset() when a day is loaded and add() / remove() as tasks come
+# and go. Picking samples an alias table of the tasks' weights at the time it was built, and
+# keeps a sample with probability (weight now / weight in the table), so tasks that were removed
+# (weight 0) or rejected since are handled without rebuilding; tasks added since are kept in a
+# short side list that's sampled alongside the table. A task whose weight went up since the build
+# can't be sampled more often than the table allows, so that makes the table stale instead. Every
+# pick therefore follows each task's weight as of its last change exactly; weights that drift on
+# their own (ages, fading penalties) are caught up when the table is rebuilt, at least hourly.
+#
+# Outcomes (offered / accepted / rejected / skipped) are kept per task id in data/pick_stats.json,
+# so rejections carry over to the next day along with the task. They're written out at most every
+# STATS_SAVE_SECONDS rather than on every pick, and by save() when the app closes.
+class TaskPicker:
+    def __init__(self, stats_path, rng=None):
+        self.stats_path = stats_path
+        self.stats = None  # task id -> {"rejected", "skipped", "at", "offered", "accepted"}, loaded on first use
+        self.rng = rng or random.Random()
+        self.tasks = {}    # task id -> Task, for everything in the list
+        self.counts = {}   # task id -> times it's in the list (a drag briefly has it in twice)
+        self.table = None  # (ids, weights, probability, alias) when built
+        self.current = []  # weight of each table slot now (0 once removed)
+        self.slots = {}    # task id -> table slot
+        self.pending = {}  # task id -> weight, for tasks added since the table was built
+        self.table_total = self.live_total = 0.0
+        self.built_at = 0.0
+        self.dirty = False   # stats changed since they were last written
+        self.saved_at = time.time()
+
+    def reset(self, tasks):
+        self.tasks = {task.id: task for task in tasks}
+        self.counts = {}
+        for task in tasks:
+            self.counts[task.id] = self.counts.get(task.id, 0) + 1
+        self.table = None
+
+    def add(self, tasks):
+        for task in tasks:
+            self.counts[task.id] = self.counts.get(task.id, 0) + 1
+            self.tasks[task.id] = task
+            self._reweigh(task.id)
+
+    def remove(self, task_ids):
+        for task_id in task_ids:
+            count = self.counts.get(task_id, 0) - 1
+            if count > 0:
+                self.counts[task_id] = count
+                continue
+            self.counts.pop(task_id, None)
+            self.tasks.pop(task_id, None)
+            self._reweigh(task_id)
+
+    # Update what the table knows about one task (after it was added, removed or rejected)
+    def _reweigh(self, task_id):
+        if self.table is None:
+            return
+        task = self.tasks.get(task_id)
+        weight = 0.0 if task is None else self.weight(task, time.time(), datetime.date.today())
+        slot = self.slots.get(task_id)
+        if slot is not None and weight > self.table[1][slot]:
+            self.table = None  # (rebuilt on the next pick)
+        elif slot is not None:
+            self.live_total += weight - self.current[slot]
+            self.current[slot] = weight
+        elif task is None:
+            self.pending.pop(task_id, None)
+        else:
+            self.pending[task_id] = weight
+
+    def weight(self, task, now, today):
+        priority = (task.meta or {}).get("priority", 1)
+        if not isinstance(priority, (int, float)) or priority <= 0:
+            priority = 1
+        age = age_factor(task.created, today) if task.created else 1.0
+        rejected, skipped = self.penalties(task.id, now)
+        return priority * age / (1 + REJECT_PENALTY * rejected + SKIP_PENALTY * skipped)
+
+    # (rejections, skips) for a task, faded by how long ago they were
+    def penalties(self, task_id, now):
+        entry = self._stats().get(task_id)
+        if entry is None:
+            return 0.0, 0.0
+        fade = 0.5 ** ((now - entry["at"]) / (PENALTY_HALF_LIFE_DAYS * 86400))
+        return entry["rejected"] * fade, entry["skipped"] * fade
+
+    def _build(self, now):
+        ids = list(self.tasks)
+        today = datetime.date.today()
+        weights = [self.weight(self.tasks[task_id], now, today) for task_id in ids]
+        self.table = (ids, weights) + alias_table(weights)
+        self.current = list(weights)
+        self.slots = {task_id: slot for slot, task_id in enumerate(ids)}
+        self.pending = {}
+        self.table_total = self.live_total = sum(weights)
+        self.built_at = now
+
+    def _stale(self, now):
+        return (self.table is None or len(self.pending) > MAX_PENDING or self.live_total < self.table_total / 2
+                or now - self.built_at > MAX_TABLE_AGE_SECONDS)
+
+    # A task from the list (None if it's empty); counts as offering it
+    def pick(self):
+        if not self.tasks:
+            return None
+        now = time.time()
+        if self._stale(now):
+            self._build(now)
+        task_id = self._sample()
+        if task_id is None:  # (very unlucky, or nearly everything rejected since the build)
+            self._build(now)
+            task_id = self._sample()
+        self.record(task_id, "offered")
+        return self.tasks[task_id]
+
+    def _sample(self):
+        ids, weights, probability, alias = self.table
+        pending_total = sum(self.pending.values())
+        for _ in range(MAX_TRIES):
+            point = self.rng.random() * (self.table_total + pending_total)
+            if point >= self.table_total:
+                point -= self.table_total
+                for task_id, weight in self.pending.items():
+                    point -= weight
+                    if point < 0:
+                        return task_id
+                continue
+            slot = self.rng.randrange(len(ids))
+            if self.rng.random() >= probability[slot]:
+                slot = alias[slot]
+            if self.rng.random() * weights[slot] < self.current[slot]:
+                return ids[slot]
+        return None
+
+    # outcome: "offered", "accepted", "rejected" or "skipped"
+    def record(self, task_id, outcome):
+        stats = self._stats()
+        now = time.time()
+        entry = stats.get(task_id)
+        if entry is None:
+            entry = stats[task_id] = {"rejected": 0.0, "skipped": 0.0, "at": now, "offered": 0, "accepted": 0}
+        else:
+            entry["rejected"], entry["skipped"] = self.penalties(task_id, now)
+            entry["at"] = now
+        entry[outcome] += 1
+        if outcome in ("rejected", "skipped"):
+            self._reweigh(task_id)
+        self.dirty = True
+        if now - self.saved_at >= STATS_SAVE_SECONDS:
+            self.save()
+
+    def _stats(self):
+        if self.stats is None:
+            self.stats = {}
+            text = storage.read_text(self.stats_path)
+            if text is not None:
+                try:
+                    self.stats = json.loads(text)
+                except ValueError:
+                    print(f"Ignoring unreadable task stats in {self.stats_path}", flush=True)
+        return self.stats
+
+    # Write the stats out if anything changed since the last time
+    def save(self):
+        if not self.dirty:
+            return
+        now = time.time()
+        cutoff = now - STATS_KEEP_DAYS * 86400
+        self.stats = {task_id: entry for task_id, entry in self.stats.items() if entry["at"] >= cutoff}
+        storage.write_text(self.stats_path, json.dumps(self.stats, separators=(",", ":")))
+        self.dirty = False
+        self.saved_at = now
@@ -0,0 +1,223 @@
+import collections
+import concurrent.futures  # indexing happens in the background
+import math
+import os
+import re
+import sqlite3
+import threading
+
+SEARCH_FILE = "search.db"
+
+# Tokens are runs of letters/digits, matched case-insensitively
+TOKEN_RE = re.compile(r"\w+")
+
+# BM25 ranking parameters (the usual defaults)
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(text.lower())
+
+
+# Query syntax: words must all appear; word* matches any word starting with "word";
+# "quoted words" must appear next to each other in that order
+def parse_query(query):
+    phrases, words, prefixes = [], [], []
+    for phrase, word in re.findall(r'"([^"]*)"|(\S+)', query):
+        if phrase:
+            tokens = tokenize(phrase)
+            if len(tokens) == 1:
+                words.extend(tokens)
+            elif tokens:
+                phrases.append(tokens)
+        elif word.endswith("*") and tokenize(word):
+            prefixes.append(tokenize(word)[0])
+        else:
+            words.extend(tokenize(word))
+    return phrases, words, prefixes
+
+
+# One search result: a day's note, or a task (with the last day it was on a list)
+SearchHit = collections.namedtuple("SearchHit", "kind date title score")
+
+
+# Persistent inverted index (data/search.db) over every day's notes and all task titles, so a
+# search never has to read through the data files. Each note and each task is a document; the
+# postings table maps term -> document -> word positions, with term as the primary key so exact
+# words and prefixes are both index range lookups, and positions are used to check phrases.
+# Results are ranked with BM25.
+#
+# A task is indexed once (by id) rather than once per day it rolled over, and remembers the
+# latest day it was saved on; once it's removed from that day, it drops out of the index. The
+# index is brought up to date by index_note / index_tasks (called whenever notes or task lists
+# are saved); those just queue the work for a background thread. The first time it's opened,
+# the whole store is indexed in the background.
+class SearchIndex:
+    def __init__(self, store):
+        self.store = store
+        self.db = sqlite3.connect(os.path.join(store.root, SEARCH_FILE), check_same_thread=False)
+        self.lock = threading.Lock()
+        self.indexer = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="search-index")
+        self.tasks = None  # task id -> (title, date) of what's indexed, loaded on first use
+        self.closing = False
+        with self.lock, self.db:
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.execute("CREATE TABLE IF NOT EXISTS docs (doc INTEGER PRIMARY KEY, kind TEXT NOT NULL, "
+                            "key TEXT NOT NULL, date TEXT NOT NULL, title TEXT, length INTEGER NOT NULL, "
+                            "UNIQUE (kind, key))")
+            self.db.execute("CREATE TABLE IF NOT EXISTS postings (term TEXT NOT NULL, doc INTEGER NOT NULL, "
+                            "positions TEXT NOT NULL, PRIMARY KEY (term, doc)) WITHOUT ROWID")
+            self.db.execute("CREATE INDEX IF NOT EXISTS postings_by_doc ON postings (doc)")
+            self.db.execute("CREATE INDEX IF NOT EXISTS docs_by_date ON docs (kind, date)")
+            self.db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            built = self.db.execute("SELECT value FROM meta WHERE key = 'built'").fetchone()
+        if built is None:
+            self.indexer.submit(self._build)
+
+    def index_note(self, date, notes):
+        self.indexer.submit(self._index_doc, "note", date, date, None, notes)
+
+    def index_tasks(self, date, tasks):
+        self.indexer.submit(self._index_tasks, date, tuple(tasks))
+
+    # Stops early (and starts over next time) if the app quits first
+    def _build(self):
+        for date in self.store.note_dates():
+            if self.closing:
+                return
+            notes = self.store.load_note(date)
+            if notes:
+                self._index_doc("note", date, date, None, notes)
+        for date in self.store.task_dates():
+            if self.closing:
+                return
+            day = self.store.load_tasks(date)
+            self._index_tasks(date, tuple(day["up_next"]) + tuple(day["done_today"]))
+        with self.lock, self.db:
+            self.db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('built', '1')")
+
+    def _index_tasks(self, date, tasks):
+        if self.tasks is None:
+            with self.lock:
+                rows = self.db.execute("SELECT key, title, date FROM docs WHERE kind = 'task'").fetchall()
+            self.tasks = {key: (title, indexed_date) for key, title, indexed_date in rows}
+        moved = []
+        for task in tasks:
+            indexed = self.tasks.get(task.id)
+            if indexed is None or indexed[0] != task.title:
+                self._index_doc("task", task.id, max(date, indexed[1]) if indexed else date, task.title, task.title)
+            elif date > indexed[1]:
+                moved.append((date, task.id))
+                self.tasks[task.id] = (task.title, date)
+        present = {task.id for task in tasks}
+        with self.lock, self.db:
+            if moved:
+                self.db.executemany("UPDATE docs SET date = ? WHERE kind = 'task' AND key = ?", moved)
+            # Tasks this was the latest day of that aren't on it any more (removed)
+            gone = [(doc, key) for doc, key in self.db.execute(
+                "SELECT doc, key FROM docs WHERE kind = 'task' AND date = ?", (date,)) if key not in present]
+            self.db.executemany("DELETE FROM postings WHERE doc = ?", [(doc,) for doc, key in gone])
+            self.db.executemany("DELETE FROM docs WHERE doc = ?", [(doc,) for doc, key in gone])
+        for doc, key in gone:
+            self.tasks.pop(key, None)
+
+    def _index_doc(self, kind, key, date, title, text):
+        positions = collections.defaultdict(list)
+        tokens = tokenize(text)
+        for position, token in enumerate(tokens):
+            positions[token].append(position)
+        with self.lock, self.db:
+            row = self.db.execute("SELECT doc FROM docs WHERE kind = ? AND key = ?", (kind, key)).fetchone()
+            if row is not None:
+                self.db.execute("DELETE FROM postings WHERE doc = ?", row)
+                self.db.execute("DELETE FROM docs WHERE doc = ?", row)
+            if not tokens:
+                return
+            doc = self.db.execute("INSERT INTO docs (kind, key, date, title, length) VALUES (?, ?, ?, ?, ?)",
+                                  (kind, key, date, title, len(tokens))).lastrowid
+            self.db.executemany("INSERT INTO postings (term, doc, positions) VALUES (?, ?, ?)",
+                                [(term, doc, ",".join(map(str, found))) for term, found in positions.items()])
+        if kind == "task" and self.tasks is not None:
+            self.tasks[key] = (title, date)
+
+    # doc -> {term: "comma,separated,positions"} for one exact term, or every term starting with
+    # `prefix`. Positions are only parsed when checking a phrase; otherwise just counted.
+    def _postings(self, term=None, prefix=None):
+        if prefix is not None:
+            rows = self.db.execute("SELECT term, doc, positions FROM postings WHERE term >= ? AND term < ?",
+                                   (prefix, prefix + "\U0010ffff")).fetchall()
+        else:
+            rows = self.db.execute("SELECT term, doc, positions FROM postings WHERE term = ?", (term,)).fetchall()
+        found = collections.defaultdict(dict)
+        for row_term, doc, positions in rows:
+            found[doc][row_term] = positions
+        return found
+
+    # Best matches first, at most `limit` of them
+    def search(self, query, limit=50):
+        phrases, words, prefixes = parse_query(query)
+        if not (phrases or words or prefixes):
+            return []
+
+        with self.lock:
+            doc_count, total_length = self.db.execute("SELECT COUNT(*), TOTAL(length) FROM docs").fetchone()
+            if doc_count == 0:
+                return []
+            average_length = total_length / doc_count
+
+            # Each query part (word, prefix or phrase) narrows down the candidate documents, as
+            # doc -> {term: how often it occurs} (a phrase counts as one term)
+            parts = [self._postings(term=word) for word in words]
+            parts += [self._postings(prefix=prefix) for prefix in prefixes]
+            parts = [{doc: {term: positions.count(",") + 1 for term, positions in terms.items()}
+                      for doc, terms in found.items()} for found in parts]
+            for phrase in phrases:
+                per_word = [self._postings(term=word) for word in phrase]
+                docs = set.intersection(*(set(found) for found in per_word))
+                matched = {}
+                for doc in docs:
+                    starts = {int(position) for position in per_word[0][doc][phrase[0]].split(",")}
+                    for offset, word in enumerate(phrase[1:], 1):
+                        starts &= {int(position) - offset for position in per_word[offset][doc][word].split(",")}
+                    if starts:
+                        matched[doc] = {" ".join(phrase): len(starts)}
+                parts.append(matched)
+
+            candidates = set.intersection(*(set(found) for found in parts))
+            if not candidates:
+                return []
+            docs = {}
+            candidate_list = list(candidates)
+            for start in range(0, len(candidate_list), 500):  # stay under SQLite's parameter limit
+                batch = candidate_list[start:start + 500]
+                docs.update((row[0], row[1:]) for row in self.db.execute(
+                    f"SELECT doc, kind, date, title, length FROM docs WHERE doc IN ({','.join('?' * len(batch))})",
+                    batch))
+
+        # BM25: each matched term contributes idf * saturated, length-normalised term frequency
+        scores = collections.Counter()
+        for found in parts:
+            idf = math.log(1 + (doc_count - len(found) + 0.5) / (len(found) + 0.5))
+            for doc in candidates:
+                length = docs[doc][3]
+                for tf in found[doc].values():
+                    scores[doc] += idf * tf * (BM25_K1 + 1) / (
+                        tf + BM25_K1 * (1 - BM25_B + BM25_B * length / average_length))
+
+        hits = [SearchHit(docs[doc][0], docs[doc][1], docs[doc][2], score) for doc, score in scores.items()]
+        hits.sort(key=lambda hit: hit.date, reverse=True)  # newest first among equal scores
+        hits.sort(key=lambda hit: hit.score, reverse=True)
+        return hits[:limit]
+
+    # Returns once every update queued so far is in the index (there's one indexing thread, so
+    # it's done once an empty job queued after them has run)
+    def flush(self):
+        self.indexer.submit(lambda: None).result()
+
+    # Wait for queued updates to finish, then close the index
+    def close(self):
+        self.closing = True
+        self.indexer.shutdown(wait=True)
+        with self.lock:
+            self.db.close()
@@ -0,0 +1,1728 @@
+import argparse
+import bisect  # sorted date index
+import collections
+import datetime
+import difflib  # rolled-over task lists are stored as deltas
+import gzip  # old months are archived compressed (gzip or lzma)
+import heapq
+import json  # day records are still plain JSON, just one small file per day
+import lzma
+import os
+import sqlite3  # optional single-file backend, see SQLiteStore
+import sys
+import tempfile
+import threading  # saving and journal compaction run in the background
+import traceback
+import uuid  # task ids
+
+if os.name == "nt":  # (file locks, see FileLock)
+    import msvcrt
+else:
+    import fcntl
+
+import perf  # read/write timings and sizes (see perf.py)
+
+# Where user data lives, relative to the working directory (same as the assets folder)
+DATA_DIR = "data"
+
+# Pre-sharding layout: every day ever recorded in two big files. Still used as the
+# import/export format, so data can move between backends (or back to an older version).
+LEGACY_TASKS_FILE = "task_lists.json"
+LEGACY_NOTES_FILE = "notes.json"
+
+# Which backend the app uses: "json" (per-day files, the default) or "sqlite"
+STORAGE_ENV_VAR = "LITTLEBITS_STORAGE"
+SQLITE_FILE = "littlebits.db"
+
+# Task list edits are appended here and folded into the day files once it grows past the threshold
+JOURNAL_FILE = "tasks.journal"
+JOURNAL_COMPACT_BYTES = 64 * 1024
+
+# The app, cli.py and storage.py can all have the same data folder open at once; this file is
+# locked (see FileLock) while any of them changes the journal or the archive
+LOCK_FILE = "littlebits.lock"
+
+# Months whose days are all older than this many days are moved out of the per-day files into one
+# compressed bundle each (data/archive/YYYY-MM.json.gz), read back on demand. Set
+# $LITTLEBITS_ARCHIVE_DAYS to change it, or to 0 to keep everything in per-day files.
+ARCHIVE_AFTER_DAYS = 42
+ARCHIVE_DAYS_ENV_VAR = "LITTLEBITS_ARCHIVE_DAYS"
+ARCHIVE_DIR = "archive"
+ARCHIVE_INDEX_FILE = "index.json"
+ARCHIVE_COMPRESSION = "gz"  # or "xz": smaller, but much slower to write
+COMPRESSORS = {"gz": gzip, "xz": lzma}
+ARCHIVE_CACHE_MONTHS = 4  # archived months kept decompressed in memory
+ARCHIVE_NOTES_INDEX_FILE = "notes.index.json"  # archived notes (see NotesContainer)
+ARCHIVE_NOTES_COMPACT_BYTES = 1024 * 1024  # dead bytes in notes.N.dat worth a compaction
+
+# A background save that fails is kept and tried again this often (and on every flush)
+SAVE_RETRY_SECONDS = 5
+
+# How many days' tasks + notes are kept parsed in memory for quick day-to-day navigation
+DAY_CACHE_SIZE = 60
+
+# A day's up_next is stored as a delta against the previous day's; every this-many days in a row
+# one is stored in full, so loading a day never has to walk back through more than that
+MAX_DELTA_CHAIN = 30
+RESOLVED_CACHE_SIZE = 64
+
+# The mode open() gives a new file (rw-rw-rw- less the umask). Reading the umask means setting
+# it, so it's put straight back; this happens once, on import.
+UMASK = os.umask(0o022)
+os.umask(UMASK)
+FILE_MODE = 0o666 & ~UMASK
+
+
+def read_text(path):
+    try:
+        with open(path, "r", encoding="utf-8", newline="") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+# Writes go to a temp file next to the target which is then swapped in with os.replace,
+# so a crash or power cut mid-save leaves either the old file or the new one, never half of each
+def write_text(path, text):
+    temp_path = write_temp(os.path.dirname(path), text.encode("utf-8"))
+    try:
+        os.replace(temp_path, path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
+
+# An empty temp file in `folder`, as (fd, path). mkstemp makes it readable by its owner only;
+# it gets FILE_MODE instead, so a file it replaces keeps the permissions other tools rely on.
+def new_temp(folder):
+    fd, temp_path = tempfile.mkstemp(dir=folder, prefix=".", suffix=".tmp")
+    os.chmod(temp_path, FILE_MODE)
+    return fd, temp_path
+
+
+# Write `data` to a new temp file in `folder` (synced to disk) and return its path
+def write_temp(folder, data):
+    os.makedirs(folder, exist_ok=True)
+    fd, temp_path = new_temp(folder)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+    except BaseException:
+        os.remove(temp_path)
+        raise
+    return temp_path
+
+
+# What a file looks like on disk, to tell whether it changed between two looks
+def file_stamp(path):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+
+def archive_after_days():
+    try:
+        return int(os.environ.get(ARCHIVE_DAYS_ENV_VAR, ARCHIVE_AFTER_DAYS))
+    except ValueError:
+        return ARCHIVE_AFTER_DAYS
+
+
+def list_dir(path):
+    try:
+        return os.listdir(path)
+    except FileNotFoundError:
+        return []
+
+
+# Exclusive lock on a file, held across processes as well as threads (flock on Unix, msvcrt on
+# Windows). Not reentrant. Use as a context manager, or acquire(blocking=False) to only try.
+class FileLock:
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()  # (the OS lock is per process, so threads queue up here first)
+        self.file = None  # opened on first use
+
+    def acquire(self, blocking=True):
+        if not self.lock.acquire(blocking):
+            return False
+        try:
+            if self.file is None:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                self.file = open(self.path, "a+b")
+            if lock_file(self.file, blocking):
+                return True
+        except BaseException:
+            self.lock.release()
+            raise
+        self.lock.release()
+        return False
+
+    def release(self):
+        unlock_file(self.file)
+        self.lock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+    def close(self):
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+
+
+if os.name == "nt":
+    def lock_file(f, blocking):
+        f.seek(0)
+        while True:
+            try:
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK if blocking else msvcrt.LK_NBLCK, 1)
+                return True
+            except OSError:
+                if not blocking:
+                    return False
+                # (LK_LOCK gives up after 10 seconds; keep waiting)
+
+    def unlock_file(f):
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+else:
+    def lock_file(f, blocking):
+        try:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return False
+        return True
+
+    def unlock_file(f):
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+# One task. Tasks are values: once made they aren't changed in place, a renamed or completed task
+# is a new Task with the same id (see replace()), which is what lets days share Task objects.
+# The id stays with the task across days and rollovers, so two tasks with the same title are
+# never mixed up.
+#   created:   'YYYY-MM-DD' the task was added (None for tasks from before ids existed)
+#   completed: ISO timestamp of when it was marked done, or None
+#   meta:      dict of anything else worth keeping with the task, or None
+class Task:
+    __slots__ = ("id", "title", "created", "completed", "meta")
+
+    def __init__(self, id, title, created=None, completed=None, meta=None):
+        self.id = id
+        self.title = title
+        self.created = created
+        self.completed = completed
+        self.meta = meta
+
+    @classmethod
+    def new(cls, title, meta=None):
+        return cls(uuid.uuid4().hex[:12], title, datetime.date.today().isoformat(), None, meta)
+
+    def replace(self, **changes):
+        fields = {name: getattr(self, name) for name in self.__slots__}
+        fields.update(changes)
+        return Task(**fields)
+
+    def mark_done(self):
+        return self.replace(completed=datetime.datetime.now().isoformat(timespec="seconds"))
+
+    def __eq__(self, other):
+        if not isinstance(other, Task):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    def __hash__(self):
+        return hash((self.id, self.title, self.created, self.completed))
+
+    def __repr__(self):
+        return f"Task({self.id!r}, {self.title!r})"
+
+    def to_json(self):
+        value = {"id": self.id, "title": self.title}
+        for name in ("created", "completed", "meta"):
+            if getattr(self, name) is not None:
+                value[name] = getattr(self, name)
+        return value
+
+    # Data saved before tasks had ids is just the title; those get `legacy_id`, which callers
+    # derive from where the title was stored so the same old task always gets the same id
+    @classmethod
+    def from_json(cls, value, legacy_id):
+        if isinstance(value, str):
+            return cls(legacy_id, value)
+        return cls(value["id"], value["title"], value.get("created"), value.get("completed"), value.get("meta"))
+
+
+def tasks_from_json(values, legacy_prefix):
+    return [Task.from_json(value, f"{legacy_prefix}.{i}") for i, value in enumerate(values)]
+
+
+# json.dump(s) default= hook for anything holding Tasks
+def task_json(value):
+    if isinstance(value, Task):
+        return value.to_json()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+# Legacy days hold plain titles, so a task carried over from day to day has no id of its own.
+# Going oldest first, a title that was in the previous day's Up Next keeps the id it had there
+# (so a rolled-over backlog is still the same tasks, and can be stored as a delta); only new
+# titles get an id made from their date and position. Yields (date, up_next, done_today).
+def legacy_days(data):
+    carried = {}  # title -> ids it had in the previous day's Up Next, in order
+    for date in sorted(data):
+        lists = {}
+        for name in ("up_next", "done_today"):
+            lists[name] = []
+            for i, value in enumerate(data[date].get(name, [])):
+                ids = carried.get(value) if isinstance(value, str) else None
+                lists[name].append(Task(ids.pop(0), value) if ids else Task.from_json(value, f"{date}.{name}.{i}"))
+        carried = {}
+        for task in lists["up_next"]:
+            carried.setdefault(task.title, []).append(task.id)
+        yield date, lists["up_next"], lists["done_today"]
+
+
+# What task_lists.json / notes.json in `folder` hold, as ("tasks", date, (up_next, done_today))
+# and ("note", date, notes)
+def legacy_files(folder):
+    tasks_path = os.path.join(folder, LEGACY_TASKS_FILE)
+    if os.path.exists(tasks_path):
+        with open(tasks_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        for date, up_next, done_today in legacy_days(data):
+            yield "tasks", date, (up_next, done_today)
+
+    notes_path = os.path.join(folder, LEGACY_NOTES_FILE)
+    if os.path.exists(notes_path):
+        with open(notes_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        for date, notes in data.items():
+            yield "note", date, notes
+
+
+# Copy task_lists.json / notes.json from `folder` into a store (days already in the store are
+# overwritten). See also core.Session.import_json, which keeps the search index up to date too.
+def import_json(store, folder):
+    for kind, date, value in legacy_files(folder):
+        if kind == "tasks":
+            store.save_tasks(date, *value)
+        else:
+            store.save_note(date, value)
+
+
+# Write everything in a store out as task_lists.json / notes.json in `folder`
+def export_json(store, folder):
+    os.makedirs(folder, exist_ok=True)
+    tasks = {}
+    for date in store.task_dates():
+        day = store.load_tasks(date)
+        tasks[date] = {"up_next": day.get("up_next", []), "done_today": day.get("done_today", [])}
+    write_text(os.path.join(folder, LEGACY_TASKS_FILE), json.dumps(tasks, indent=4, default=task_json))
+
+    notes = {date: store.load_note(date) for date in store.note_dates()}
+    write_text(os.path.join(folder, LEGACY_NOTES_FILE), json.dumps(notes, indent=4))
+
+
+# One-time conversion of data/task_lists.json and data/notes.json into the store.
+# The old files are only renamed (never deleted) once every day has been written out,
+# so an interrupted migration simply runs again on the next start.
+def migrate_legacy_files(store):
+    import_json(store, store.root)
+    for name in (LEGACY_TASKS_FILE, LEGACY_NOTES_FILE):
+        path = os.path.join(store.root, name)
+        if os.path.exists(path):
+            os.replace(path, path + ".migrated")
+
+
+# Delta from list `base` to list `tasks`: [start, end] copies base[start:end], anything else is
+# a task inserted as-is. A backlog that rolled over with a couple of tasks done and one added
+# comes out as e.g. [[0, 12], [13, 200], {"id": ..., "title": "new task"}].
+def encode_delta(base, tasks):
+    delta = []
+    matcher = difflib.SequenceMatcher(None, base, tasks, autojunk=False)
+    for tag, base_start, base_end, start, end in matcher.get_opcodes():
+        if tag == "equal":
+            delta.append([base_start, base_end])
+        elif tag in ("insert", "replace"):
+            delta.extend(tasks[start:end])
+    return delta
+
+
+# Inverse of encode_delta. An unchanged backlog decodes to the very same tuple as its base,
+# and in general the tasks themselves are shared with the base rather than copied.
+def apply_delta(base, delta):
+    if len(delta) == 1 and delta[0] == [0, len(base)]:
+        return base
+    tasks = []
+    for part in delta:
+        if isinstance(part, list):
+            tasks.extend(base[part[0]:part[1]])
+        else:
+            tasks.append(part)
+    return tuple(tasks)
+
+
+# Task list storage shared by the backends. Unfinished tasks roll over every day, so rather than
+# store the same backlog again under each date, a day's up_next is saved as a delta against the
+# previous day with data (its "rollover_from" day), and storage grows with what actually changed.
+# Records, as kept by the backend's read_record / write_record:
+#   {"up_next": [...], "done_today": [...]}                                         stored in full
+#   {"rollover_from": date, "depth": n, "up_next_delta": [...], "done_today": [...]}  delta
+# plus the journal's "seq". Tasks are Task.to_json() dicts (plain titles in older data).
+# A delta always points at the day right before it, so saving a day re-encodes the day after it;
+# MAX_DELTA_CHAIN caps how many deltas stack up between full days.
+class RolloverDeltas:
+    def __init__(self):
+        self.days_lock = threading.RLock()  # a save reads and rewrites neighbouring days
+        self.resolved = collections.OrderedDict()  # date -> (seq, up_next tuple), for decoding deltas quickly
+
+    # Returns {"up_next": (Task, ...), "done_today": [Task, ...]}, or None if nothing is saved for
+    # that day. up_next is a tuple that may be shared with other days -- copy it before changing it.
+    # Days written by the task journal also carry the "seq" of the last edit folded into them.
+    def load_tasks(self, date):
+        with self.days_lock:
+            record = self.read_record(date)
+            if record is None:
+                return None
+            day = {"up_next": self._up_next(date, record),
+                   "done_today": tasks_from_json(record["done_today"], f"{date}.done_today")}
+        if record.get("seq") is not None:
+            day["seq"] = record["seq"]
+        return day
+
+    def _up_next(self, date, record):
+        seq, up_next = self.resolved.get(date, (None, None))
+        if up_next is not None and seq == record.get("seq"):  # (another process may have saved it since)
+            self.resolved.move_to_end(date)
+            return up_next
+        base_date = record.get("rollover_from")
+        if base_date is None:
+            up_next = tuple(tasks_from_json(record["up_next"], f"{date}.up_next"))
+        else:
+            base = self.read_record(base_date)
+            delta = [part if isinstance(part, list) else Task.from_json(part, f"{date}.up_next_delta.{i}")
+                     for i, part in enumerate(record["up_next_delta"])]
+            up_next = apply_delta(self._up_next(base_date, base) if base else (), delta)
+        self._remember(date, record.get("seq"), up_next)
+        return up_next
+
+    def _remember(self, date, seq, up_next):
+        self.resolved[date] = seq, up_next
+        self.resolved.move_to_end(date)
+        while len(self.resolved) > RESOLVED_CACHE_SIZE:
+            self.resolved.popitem(last=False)
+
+    # Record for `up_next` on `date`, as a delta against `base_date` when that's worth it
+    def _encode(self, date, up_next, done_today, seq, base_date):
+        record = {"up_next": list(up_next), "done_today": list(done_today)}
+        if base_date is not None:
+            base = self.read_record(base_date)
+            depth = base.get("depth", 0) + 1 if "rollover_from" in base else 1
+            if depth <= MAX_DELTA_CHAIN:
+                delta = encode_delta(self._up_next(base_date, base), tuple(up_next))
+                if any(isinstance(part, list) for part in delta):  # shares something with the base
+                    record = {"rollover_from": base_date, "depth": depth, "up_next_delta": delta,
+                              "done_today": list(done_today)}
+        if seq is not None:
+            record["seq"] = seq
+        return record
+
+    def save_tasks(self, date, up_next, done_today, seq=None):
+        up_next = tuple(up_next)
+        with self.days_lock:
+            next_date = self.record_after(date)
+            next_record = self.read_record(next_date) if next_date else None
+            if next_record is not None and "rollover_from" not in next_record:
+                next_record = None  # stored in full, doesn't depend on this day
+            if next_record is not None:
+                next_up_next = self._up_next(next_date, next_record)
+                if next_record["rollover_from"] == date:
+                    # Its base is about to change: store it in full first, so it never decodes wrong
+                    self.write_record(next_date, self._encode(next_date, next_up_next, next_record["done_today"],
+                                                              next_record.get("seq"), None))
+
+            self.write_record(date, self._encode(date, up_next, done_today, seq, self.record_before(date)))
+            self._remember(date, seq, up_next)
+
+            if next_record is not None:
+                # Now re-encode the next day against this one
+                self.write_record(next_date, self._encode(next_date, next_up_next, next_record["done_today"],
+                                                          next_record.get("seq"), date))
+
+    # Most recent day before `date` that has task data, as (date, day) -- used for rolling
+    # unfinished tasks over
+    def latest_tasks_before(self, date):
+        with self.days_lock:
+            day = self.record_before(date)
+            if day is None:
+                return None
+            return day, self.load_tasks(day)
+
+
+# Archived notes: one append-only data file of notes, each compressed on its own, plus an offset
+# table, so reading one day's note is a seek and a read of just that note:
+#   data/archive/notes.1.dat           ->  the notes, back to back
+#   data/archive/notes.index.json      ->  {"data": "notes.1.dat", "compression": "gz",
+#                                           "notes": {date: [offset, length]}}
+# Putting a note again appends the new version and rewrites only the index; the bytes it replaced
+# are dead until the live notes are copied into a fresh data file (notes.2.dat, ...), which
+# happens once the dead bytes outweigh the live ones. Not thread-safe (ShardedStore holds
+# days_lock around every call).
+class NotesContainer:
+    def __init__(self, folder, compression=ARCHIVE_COMPRESSION):
+        self.folder = folder
+        self.index_path = os.path.join(folder, ARCHIVE_NOTES_INDEX_FILE)
+        text = read_text(self.index_path)
+        self.index = json.loads(text) if text else {"data": None, "compression": compression, "notes": {}}
+        self.file = None  # the data file, opened for reading on first use
+
+    def dates(self):
+        return self.index["notes"].keys()
+
+    def read(self, date):
+        entry = self.index["notes"].get(date)
+        if entry is None:
+            return None
+        offset, length = entry
+        with perf.span("storage.read_archived_note") as span:
+            if self.file is None:
+                self.file = open(os.path.join(self.folder, self.index["data"]), "rb")
+            self.file.seek(offset)
+            data = self.file.read(length)
+            span.bytes_read = length
+            return COMPRESSORS[self.index["compression"]].decompress(data).decode("utf-8")
+
+    # Compressed notes ready for put(); separate so the slow part can run without the lock
+    def encode(self, notes):
+        compressor = COMPRESSORS[self.index["compression"]]
+        return {date: compressor.compress(text.encode("utf-8")) for date, text in notes.items()}
+
+    # Add (or replace) notes from encode(). Synced to disk before the index points at them.
+    def put(self, encoded):
+        if not encoded:
+            return
+        name = self.index["data"] or "notes.1.dat"
+        notes = dict(self.index["notes"])
+        os.makedirs(self.folder, exist_ok=True)
+        with perf.span("storage.write_archived_note") as span, open(os.path.join(self.folder, name), "ab") as f:
+            offset = f.seek(0, os.SEEK_END)  # (after any bytes a crash left unindexed)
+            for date, data in encoded.items():
+                f.write(data)
+                notes[date] = [offset, len(data)]
+                offset += len(data)
+                span.bytes_written += len(data)
+            f.flush()
+            os.fsync(f.fileno())
+        self._write_index(dict(self.index, data=name, notes=notes))
+        live = sum(length for _, length in notes.values())
+        if offset - live > max(live, ARCHIVE_NOTES_COMPACT_BYTES):
+            self.compact()
+
+    # Copy the live notes into the next data file, point the index at it, then drop the old one
+    def compact(self):
+        old_name = self.index["data"]
+        name = f"notes.{int(old_name.split('.')[1]) + 1}.dat"
+        notes = {}
+        fd, temp_path = new_temp(self.folder)
+        try:
+            with os.fdopen(fd, "wb") as out, open(os.path.join(self.folder, old_name), "rb") as f:
+                offset = 0
+                for date, (old_offset, length) in sorted(self.index["notes"].items(), key=lambda item: item[1]):
+                    f.seek(old_offset)
+                    out.write(f.read(length))
+                    notes[date] = [offset, length]
+                    offset += length
+                out.flush()
+                os.fsync(out.fileno())
+            os.replace(temp_path, os.path.join(self.folder, name))
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        self._write_index(dict(self.index, data=name, notes=notes))
+        os.remove(os.path.join(self.folder, old_name))
+
+    def _write_index(self, index):
+        write_text(self.index_path, json.dumps(index, separators=(",", ":")))
+        self.index = index
+        self.close()  # (the data file may have changed; reopened on the next read)
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+# Per-day sharded storage. Each day gets its own small file, grouped into month folders:
+#   data/tasks/2024-01/2024-01-05.json  ->  a task record (see RolloverDeltas)
+#   data/notes/2024-01/2024-01-05.txt   ->  the note text, as-is
+# so loading or saving a day only ever touches that day's data, however long the history is.
+#
+# Months that have gone cold (see ARCHIVE_AFTER_DAYS) are moved by archive_old_days into the
+# archive: task records into one compressed bundle per month, listed in an index so nothing needs
+# decompressing to find a date, and notes (the bulk of the data) into a NotesContainer:
+#   data/archive/2024-01.json.gz        ->  {"tasks": {date: record}, "notes": {}}
+#   data/archive/index.json             ->  {"2024-01": {"file", "tasks": [dates], "notes": []}}
+#   data/archive/notes.*                ->  see NotesContainer
+# (Bundles archived before notes had a container of their own still hold notes; they move over
+# the next time their month is archived.) A day without its own file is looked up there, through
+# a small cache of decompressed months. Saving an archived day just writes its own file again,
+# which wins over the archive until the next archive pass folds it back in.
+class ShardedStore(RolloverDeltas):
+    def __init__(self, root=DATA_DIR, compression=ARCHIVE_COMPRESSION):
+        super().__init__()
+        self.root = root
+        self.tasks_dir = os.path.join(root, "tasks")
+        self.notes_dir = os.path.join(root, "notes")
+        self.archive_dir = os.path.join(root, ARCHIVE_DIR)
+        self.compression = compression
+        self.file_lock = FileLock(os.path.join(root, LOCK_FILE))
+        self.archive_index = None  # loaded on first use; guarded (like the bundles) by days_lock
+        self.archive_stamp = None  # file_stamp of the index when it was loaded
+        self.archived = {}         # "tasks" / "notes" -> sorted archived dates
+        self.bundles = collections.OrderedDict()  # month -> decompressed bundle
+        self.archived_notes = None  # NotesContainer, opened with the index
+        migrate_legacy_files(self)
+
+    def task_path(self, date):
+        return os.path.join(self.tasks_dir, date[:7], date + ".json")
+
+    def note_path(self, date):
+        return os.path.join(self.notes_dir, date[:7], date + ".txt")
+
+    def read_record(self, date):
+        with perf.span("storage.read_tasks") as span:
+            text = read_text(self.task_path(date))
+            if text is None:
+                return self._archived("tasks", date)
+            span.bytes_read = perf.text_bytes(text)
+            return json.loads(text)
+
+    def write_record(self, date, record):
+        with perf.span("storage.write_tasks") as span:
+            text = json.dumps(record, indent=4, default=task_json)
+            span.bytes_written = perf.text_bytes(text)
+            write_text(self.task_path(date), text)
+
+    # Closest day before / after `date` with task data. Only the month folders that can hold
+    # such a day are listed, nearest first.
+    def record_before(self, date):
+        archived = self._archived_dates("tasks")
+        i = bisect.bisect_left(archived, date)
+        found = archived[i - 1] if i else None
+        for month in sorted(list_dir(self.tasks_dir), reverse=True):
+            if month > date[:7]:
+                continue
+            if found is not None and month < found[:7]:
+                break
+            for day in sorted(self._month_dates(self.tasks_dir, month, ".json"), reverse=True):
+                if day < date:
+                    return max(day, found or day)
+        return found
+
+    def record_after(self, date):
+        archived = self._archived_dates("tasks")
+        i = bisect.bisect_right(archived, date)
+        found = archived[i] if i < len(archived) else None
+        for month in sorted(list_dir(self.tasks_dir)):
+            if month < date[:7]:
+                continue
+            if found is not None and month > found[:7]:
+                break
+            for day in sorted(self._month_dates(self.tasks_dir, month, ".json")):
+                if day > date:
+                    return min(day, found or day)
+        return found
+
+    # Returns the note text, or None if there is no note for that day
+    def load_note(self, date):
+        with perf.span("storage.read_note") as span:
+            notes = read_text(self.note_path(date))
+            if notes is None:
+                return self._archived("notes", date)
+            span.bytes_read = perf.text_bytes(notes)
+            return notes
+
+    def save_note(self, date, notes):
+        with perf.span("storage.write_note") as span:
+            span.bytes_written = perf.text_bytes(notes)
+            with self.days_lock:  # (not while its month is being archived)
+                write_text(self.note_path(date), notes)
+
+    # All days with task data / notes, oldest first
+    def task_dates(self):
+        return self._dates(self.tasks_dir, ".json", "tasks")
+
+    def note_dates(self):
+        return self._dates(self.notes_dir, ".txt", "notes")
+
+    def _dates(self, folder, suffix, kind):
+        hot = (day for month in sorted(list_dir(folder)) for day in sorted(self._month_dates(folder, month, suffix)))
+        previous = None
+        for day in heapq.merge(hot, self._archived_dates(kind)):
+            if day != previous:
+                previous = day
+                yield day
+
+    def _month_dates(self, folder, month, suffix):
+        return [name[:-len(suffix)] for name in list_dir(os.path.join(folder, month))
+                if name.endswith(suffix) and not name.startswith(".")]
+
+    # -- The archive
+
+    def _archived_dates(self, kind):
+        with self.days_lock:
+            index_path = os.path.join(self.archive_dir, ARCHIVE_INDEX_FILE)
+            stamp = file_stamp(index_path)
+            if self.archive_index is None or stamp != self.archive_stamp:
+                # First use, or another process has archived something since
+                text = read_text(index_path)
+                if self.archived_notes is not None:
+                    self.archived_notes.close()
+                self.archived_notes = NotesContainer(self.archive_dir, self.compression)
+                self.bundles.clear()
+                self.archive_stamp = stamp
+                self._set_archive_index(json.loads(text) if text else {})
+            return self.archived[kind]
+
+    def _set_archive_index(self, index):
+        self.archive_index = index
+        self.archived = {kind: sorted(date for month in index.values() for date in month[kind])
+                         for kind in ("tasks", "notes")}
+        self.archived["notes"] = sorted(set(self.archived["notes"]).union(self.archived_notes.dates()))
+
+    # A day's record / note from the archive, or None if it isn't archived
+    def _archived(self, kind, date):
+        with self.days_lock:
+            # (checked again under the lock: the file may just have been archived)
+            archived = self._archived_dates(kind)
+            i = bisect.bisect_left(archived, date)
+            if i == len(archived) or archived[i] != date:
+                return None
+            if kind == "notes" and date in self.archived_notes.index["notes"]:
+                return self.archived_notes.read(date)
+            return self._bundle(date[:7])[kind].get(date)
+
+    def _bundle(self, month):
+        bundle = self.bundles.get(month)
+        if bundle is not None:
+            self.bundles.move_to_end(month)
+            return bundle
+        entry = self.archive_index.get(month)
+        if entry is None:
+            return {"tasks": {}, "notes": {}}
+        with perf.span("storage.read_archive") as span:
+            with open(os.path.join(self.archive_dir, entry["file"]), "rb") as f:
+                data = f.read()
+            span.bytes_read = len(data)
+            bundle = json.loads(COMPRESSORS[entry["file"].rsplit(".", 1)[1]].decompress(data))
+        self.bundles[month] = bundle
+        while len(self.bundles) > ARCHIVE_CACHE_MONTHS:
+            self.bundles.popitem(last=False)
+        return bundle
+
+    # Moves every month whose days are all more than `after_days` old (default: archive_after_days())
+    # into the archive, merging with what's already archived for it. Safe to run alongside loads
+    # and saves, here or in another process: a month is compressed without holding any lock, and
+    # only swapped in (and its day files deleted), under days_lock and the file lock, if nothing
+    # about it changed meanwhile -- otherwise it's left for the next pass.
+    # `stop` (a threading.Event) ends the pass between months. Returns how many were archived.
+    def archive_old_days(self, after_days=None, stop=None):
+        if after_days is None:
+            after_days = archive_after_days()
+        if after_days <= 0:
+            return 0
+        cutoff = (datetime.date.today() - datetime.timedelta(days=after_days)).isoformat()[:7]
+        archived = 0
+        for month in sorted(set(list_dir(self.tasks_dir)) | set(list_dir(self.notes_dir))):
+            if month >= cutoff or (stop is not None and stop.is_set()):
+                break
+            if self._archive_month(month):
+                archived += 1
+        return archived
+
+    # path -> (kind, date) for the day files of a month
+    def _month_files(self, month):
+        files = {}
+        for kind, folder, suffix in (("tasks", self.tasks_dir, ".json"), ("notes", self.notes_dir, ".txt")):
+            for date in self._month_dates(folder, month, suffix):
+                files[os.path.join(folder, month, date + suffix)] = (kind, date)
+        return files
+
+    def _archive_month(self, month):
+        files = self._month_files(month)
+        if not files:
+            return False
+        stats = {path: file_stamp(path) for path in files}  # (before reading, so a change shows)
+        with self.days_lock:
+            self._archived_dates("tasks")
+            old_entry = self.archive_index.get(month)
+            old_bundle = self._bundle(month)
+            bundle = {"tasks": dict(old_bundle["tasks"]), "notes": {}}
+            notes = dict(old_bundle["notes"])  # (moving over from an older bundle)
+        for path, (kind, date) in files.items():
+            text = read_text(path)
+            if text is None:
+                return False
+            if kind == "tasks":
+                bundle["tasks"][date] = json.loads(text)
+            else:
+                notes[date] = text
+        encoded_notes = self.archived_notes.encode(notes)
+        name = f"{month}.json.{self.compression}"
+        with perf.span("storage.write_archive") as span:
+            data = COMPRESSORS[self.compression].compress(
+                json.dumps(bundle, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+            span.bytes_written = len(data)
+            temp_path = write_temp(self.archive_dir, data)
+        try:
+            with self.file_lock, self.days_lock:
+                self._archived_dates("tasks")  # (picks up what another process archived meanwhile)
+                if (self._month_files(month) != files or any(file_stamp(path) != stats[path] for path in files)
+                        or self.archive_index.get(month) != old_entry):
+                    os.remove(temp_path)
+                    return False
+                # Notes, bundle and index first, day files last: a crash in between leaves both copies
+                self.archived_notes.put(encoded_notes)
+                os.replace(temp_path, os.path.join(self.archive_dir, name))
+                if old_entry is not None and old_entry["file"] != name:
+                    os.remove(os.path.join(self.archive_dir, old_entry["file"]))
+                index = dict(self.archive_index)
+                index[month] = {"file": name, "tasks": sorted(bundle["tasks"]), "notes": sorted(bundle["notes"])}
+                index_path = os.path.join(self.archive_dir, ARCHIVE_INDEX_FILE)
+                write_text(index_path, json.dumps(index, separators=(",", ":")))
+                self.archive_stamp = file_stamp(index_path)
+                self._set_archive_index(index)
+                self.bundles[month] = bundle
+                for path in files:
+                    os.remove(path)
+                for folder in (self.tasks_dir, self.notes_dir):
+                    try:
+                        os.rmdir(os.path.join(folder, month))
+                    except OSError:
+                        pass  # not empty (a temp file left by a crash), or never there
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        return True
+
+    def close(self):
+        with self.days_lock:
+            if self.archived_notes is not None:
+                self.archived_notes.close()
+        self.file_lock.close()
+
+
+# Single-file SQLite backend (data/littlebits.db). Each day is one row keyed by date, so a
+# save updates that row only, and the rollover lookup is a single indexed query.
+# WAL mode keeps reads from blocking on writes and makes each save a small append.
+# For delta rows (see RolloverDeltas) the up_next column holds the delta.
+class SQLiteStore(RolloverDeltas):
+    def __init__(self, root=DATA_DIR):
+        super().__init__()
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        # Shared with the journal's compaction thread, so every statement goes through self.lock
+        self.db = sqlite3.connect(os.path.join(root, SQLITE_FILE), check_same_thread=False)
+        self.lock = threading.Lock()
+        self.file_lock = FileLock(os.path.join(root, LOCK_FILE))  # (see TaskJournal)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")  # durable at checkpoints, safe against corruption
+        with self.db:
+            # PRIMARY KEY on date doubles as the date index (WITHOUT ROWID stores rows in date order)
+            self.db.execute("CREATE TABLE IF NOT EXISTS task_days ("
+                            "date TEXT PRIMARY KEY, up_next TEXT NOT NULL, done_today TEXT NOT NULL, "
+                            "seq INTEGER) WITHOUT ROWID")
+            self.db.execute("CREATE TABLE IF NOT EXISTS notes ("
+                            "date TEXT PRIMARY KEY, body TEXT NOT NULL) WITHOUT ROWID")
+            # Columns added since the first version of the schema
+            columns = [row[1] for row in self.db.execute("PRAGMA table_info(task_days)")]
+            for column, column_type in (("seq", "INTEGER"), ("rollover_from", "TEXT"), ("depth", "INTEGER")):
+                if column not in columns:
+                    self.db.execute(f"ALTER TABLE task_days ADD COLUMN {column} {column_type}")
+        migrate_legacy_files(self)
+
+    def read_record(self, date):
+        with perf.span("storage.read_tasks") as span:
+            with self.lock:
+                row = self.db.execute("SELECT up_next, done_today, seq, rollover_from, depth FROM task_days "
+                                      "WHERE date = ?", (date,)).fetchone()
+            if row is not None:
+                span.bytes_read = perf.text_bytes(row[0]) + perf.text_bytes(row[1])
+        if row is None:
+            return None
+        up_next, done_today, seq, rollover_from, depth = row
+        record = {"done_today": json.loads(done_today)}
+        if rollover_from is None:
+            record["up_next"] = json.loads(up_next)
+        else:
+            record.update(rollover_from=rollover_from, depth=depth, up_next_delta=json.loads(up_next))
+        if seq is not None:
+            record["seq"] = seq
+        return record
+
+    def write_record(self, date, record):
+        up_next = record["up_next_delta"] if "rollover_from" in record else record["up_next"]
+        with perf.span("storage.write_tasks") as span:
+            up_next = json.dumps(up_next, default=task_json)
+            done_today = json.dumps(record["done_today"], default=task_json)
+            span.bytes_written = perf.text_bytes(up_next) + perf.text_bytes(done_today)
+            with self.lock, self.db:
+                self.db.execute("INSERT OR REPLACE INTO task_days (date, up_next, done_today, seq, rollover_from, "
+                                "depth) VALUES (?, ?, ?, ?, ?, ?)",
+                                (date, up_next, done_today, record.get("seq"),
+                                 record.get("rollover_from"), record.get("depth")))
+
+    def record_before(self, date):
+        with self.lock:
+            row = self.db.execute("SELECT date FROM task_days WHERE date < ? ORDER BY date DESC LIMIT 1",
+                                  (date,)).fetchone()
+        return None if row is None else row[0]
+
+    def record_after(self, date):
+        with self.lock:
+            row = self.db.execute("SELECT date FROM task_days WHERE date > ? ORDER BY date LIMIT 1",
+                                  (date,)).fetchone()
+        return None if row is None else row[0]
+
+    def load_note(self, date):
+        with perf.span("storage.read_note") as span:
+            with self.lock:
+                row = self.db.execute("SELECT body FROM notes WHERE date = ?", (date,)).fetchone()
+            if row is not None:
+                span.bytes_read = perf.text_bytes(row[0])
+        return None if row is None else row[0]
+
+    def save_note(self, date, notes):
+        with perf.span("storage.write_note") as span:
+            span.bytes_written = perf.text_bytes(notes)
+            with self.lock, self.db:
+                self.db.execute("INSERT OR REPLACE INTO notes (date, body) VALUES (?, ?)", (date, notes))
+
+    def task_dates(self):
+        with self.lock:
+            return [row[0] for row in self.db.execute("SELECT date FROM task_days ORDER BY date")]
+
+    def note_dates(self):
+        with self.lock:
+            return [row[0] for row in self.db.execute("SELECT date FROM notes ORDER BY date")]
+
+    # Nothing to do: the database is one file however many days it holds, and a save only
+    # touches that day's row
+    def archive_old_days(self, after_days=None, stop=None):
+        return 0
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+        self.file_lock.close()
+
+
+# Smallest edit turning list `old` into `new`, as a journal op on list `name` (or None if they're equal).
+# The trimmed middle tells us what happened: pure insert = add, pure delete = remove, one item
+# swapped = edit, one item shifted along = move, anything else is spliced in as a replace.
+def diff_list(name, old, new):
+    if old == new:
+        return None
+    start = 0
+    while start < len(old) and start < len(new) and old[start] == new[start]:
+        start += 1
+    old_end, new_end = len(old), len(new)
+    while old_end > start and new_end > start and old[old_end - 1] == new[new_end - 1]:
+        old_end -= 1
+        new_end -= 1
+    removed, added = old[start:old_end], new[start:new_end]
+
+    if not removed:
+        return {"op": "add", "list": name, "at": start, "tasks": added}
+    if not added:
+        return {"op": "remove", "list": name, "at": start, "count": len(removed)}
+    if len(removed) == 1 and len(added) == 1:
+        return {"op": "edit", "list": name, "at": start, "task": added[0]}
+    if len(removed) == len(added):
+        if removed[1:] == added[:-1] and removed[0] == added[-1]:
+            return {"op": "move", "list": name, "from": start, "to": old_end - 1}
+        if removed[:-1] == added[1:] and removed[-1] == added[0]:
+            return {"op": "move", "list": name, "from": old_end - 1, "to": start}
+    return {"op": "replace", "list": name, "at": start, "count": len(removed), "tasks": added}
+
+
+# Journal ops that turn `old` day lists into the `new` ones. Moving one task from up_next into
+# done_today (marking it done, or dragging it across) is recorded as a single "complete", carrying
+# the task as it is now (it usually gains a completed time on the way).
+def diff_day(old, new):
+    up_next_op = diff_list("up_next", old["up_next"], new["up_next"])
+    done_today_op = diff_list("done_today", old["done_today"], new["done_today"])
+    if (up_next_op and done_today_op and up_next_op["op"] == "remove" and up_next_op["count"] == 1
+            and done_today_op["op"] == "add" and len(done_today_op["tasks"]) == 1
+            and done_today_op["tasks"][0].id == old["up_next"][up_next_op["at"]].id):
+        return [{"op": "complete", "at": up_next_op["at"], "to": done_today_op["at"], "task": done_today_op["tasks"][0]}]
+    return [op for op in (up_next_op, done_today_op) if op]
+
+
+def apply_op(day, op):
+    kind = op["op"]
+    if kind == "complete":
+        task = day["up_next"].pop(op["at"])
+        day["done_today"].insert(op["to"], op.get("task", task))
+        return
+    tasks = day[op["list"]]
+    if kind == "add":
+        tasks[op["at"]:op["at"]] = op["tasks"]
+    elif kind == "remove":
+        del tasks[op["at"]:op["at"] + op["count"]]
+    elif kind == "edit":
+        tasks[op["at"]] = op["task"]
+    elif kind == "move":
+        tasks.insert(op["to"], tasks.pop(op["from"]))
+    elif kind == "replace":
+        tasks[op["at"]:op["at"] + op["count"]] = op["tasks"]
+    else:
+        raise ValueError(f"Unknown journal op {kind!r}")
+
+
+# Three-way merge of one list, by task id: `base` is the list as we loaded it, `mine` is base with
+# our edits and `theirs` is base with another process's. Their list is kept, less the tasks we
+# removed; the tasks we added, changed or moved go back in just before the task that follows them
+# in mine (or at the end). Returns the merged list and the ids of the tasks we put in.
+def merge_list(base, mine, theirs):
+    changed = [True] * len(mine)
+    for block in difflib.SequenceMatcher(None, base, mine, autojunk=False).get_matching_blocks():
+        changed[block.b:block.b + block.size] = [False] * block.size
+    placed = {task.id for task, was_changed in zip(mine, changed) if was_changed}
+    removed = {task.id for task in base}.difference(task.id for task in mine)
+    merged = [task for task in theirs if task.id not in removed and task.id not in placed]
+    for i in reversed(range(len(mine))):
+        if changed[i]:
+            ids = [task.id for task in merged]
+            at = next((ids.index(task.id) for task in mine[i + 1:] if task.id in ids), len(merged))
+            merged.insert(at, mine[i])
+    return merged, placed
+
+
+# merge_list for both of a day's lists. A task that ends up in both (we edited it while cli.py
+# marked it done, say) stays in the one we put it in.
+def merge_day(base, mine, theirs):
+    names = ("up_next", "done_today")
+    if all(theirs[name] == base[name] for name in names):
+        return mine
+    merged, placed = {}, {}
+    for name in names:
+        merged[name], placed[name] = merge_list(base[name], mine[name], theirs[name])
+    for name, other in (names, names[::-1]):
+        merged[name] = [task for task in merged[name] if task.id in placed[name] or task.id not in placed[other]]
+    return merged
+
+
+# Tells journal files apart: the id in the start record, plus the inode, which stays the same when
+# the file is renamed to .compacting. None if there's no such file.
+def journal_identity(path):
+    try:
+        with open(path, "rb") as f:
+            first_line = f.readline()
+            inode = os.fstat(f.fileno()).st_ino
+    except FileNotFoundError:
+        return None
+    try:
+        return json.loads(first_line).get("id"), inode
+    except ValueError:
+        return None, inode  # (journals from before start records had ids, or a torn first line)
+
+
+# Append-only journal in front of a store's task lists. save_tasks works out what changed since the
+# last save (see diff_day) and appends just that edit -- a line of JSON, fsynced -- instead of
+# rewriting the day. Days touched since the last compaction are kept materialized in memory, and on
+# startup they're rebuilt from the store's day files (the snapshot) plus the journal tail.
+#
+# Once the journal passes `compact_bytes` it's swapped for a fresh one and a background thread folds
+# it into the store. Every edit has a sequence number and each day file remembers the last one folded
+# into it, so replaying after a crash mid-compaction never applies an edit twice.
+#
+# Other processes (cli.py from a hotkey or cron job, a second window) write to the same journal, so
+# every append and compaction happens under the store's file lock, after first reading whatever
+# they appended meanwhile (_sync). If they changed a day since we handed it out, what's saved is
+# merged with their version (see merge_day) rather than written over it. Notes pass straight
+# through to the store, leaving a "note" record for other processes to notice. change_handler
+# (task_dates, note_dates) hears about days changed by another process (None: any day may have).
+class TaskJournal:
+    def __init__(self, store, compact_bytes=JOURNAL_COMPACT_BYTES):
+        self.store = store
+        self.root = store.root
+        self.compact_bytes = compact_bytes
+        self.path = os.path.join(self.root, JOURNAL_FILE)
+        self.compacting_path = self.path + ".compacting"
+        self.lock = threading.Lock()
+        self.file_lock = store.file_lock
+        self.fold_lock = FileLock(self.compacting_path + ".lock")  # held by whoever is folding it in
+        self.days = {}  # date -> {"up_next": [...], "done_today": [...], "seq": n} for days with journaled edits
+        self.known = collections.OrderedDict()  # date -> the lists as last loaded / saved through us
+        self.seq = 0
+        self.identity = None  # journal_identity of the journal we've read up to self.size
+        self.size = 0
+        self.compaction = None
+        self.change_handler = None
+
+        with self.file_lock:
+            self._replay(self.compacting_path)
+            self.identity = journal_identity(self.path)
+            self.size = self._replay(self.path)[0]
+            if self.size == 0:
+                self._start_journal()
+            if os.path.exists(self.compacting_path):
+                # Finish a compaction that was interrupted last time
+                self._start_compaction()
+
+    # Applies the records in journal file `path` from byte `offset` on, and returns (where they
+    # end, dates with task records, dates with note records)
+    def _replay(self, path, offset=0):
+        task_dates, note_dates = set(), set()
+        try:
+            f = open(path, "r+b")
+        except FileNotFoundError:
+            return 0, task_dates, note_dates
+        with f:
+            f.seek(offset)
+            intact = offset
+            for line in f:
+                try:
+                    if not line.endswith(b"\n"):
+                        raise ValueError("unterminated line")
+                    record = json.loads(line)
+                except ValueError:
+                    # Torn final append from a crash: everything before it is intact, so cut it off
+                    # rather than letting the next append land on the end of it
+                    f.truncate(intact)
+                    break
+                intact += len(line)
+                self.seq = max(self.seq, record["seq"])
+                if record["op"] == "start":
+                    continue
+                if record["op"] == "note":
+                    note_dates.add(record["date"])
+                    continue
+                legacy_id = f"journal.{record['seq']}"
+                if "tasks" in record:
+                    record["tasks"] = tasks_from_json(record["tasks"], legacy_id)
+                if "task" in record:
+                    record["task"] = Task.from_json(record["task"], legacy_id)
+                task_dates.add(record["date"])  # (even if it's already in the store, it's news to us)
+                day = self._materialize(record["date"])
+                if record["seq"] > day["seq"]:
+                    apply_op(day, record)
+                    day["seq"] = record["seq"]
+        return intact, task_dates, note_dates
+
+    # Catch up with what other processes appended since we last looked (call with self.lock and
+    # the file lock held). Returns the dates whose tasks / notes they changed, or (None, None) if
+    # the journal we were reading has been compacted and folded away since, and everything was
+    # read again.
+    def _sync(self):
+        identity = journal_identity(self.path)
+        if identity == self.identity:
+            self.size, task_dates, note_dates = self._replay(self.path, self.size)
+            return task_dates, note_dates
+        if identity is not None and journal_identity(self.compacting_path) == self.identity:
+            # Another process swapped in a new journal: finish the old one, then read the new one
+            _, task_dates, note_dates = self._replay(self.compacting_path, self.size)
+            self.size, new_task_dates, new_note_dates = self._replay(self.path)
+            self.identity = identity
+            return task_dates | new_task_dates, note_dates | new_note_dates
+        # Already folded into the store: start again from that and whichever journals there are now
+        self.days = {}
+        self._replay(self.compacting_path)
+        self.identity = identity
+        self.size = self._replay(self.path)[0]
+        if self.size == 0:
+            self._start_journal()
+        return None, None
+
+    # In-memory copy of a day's lists that journaled edits get applied to
+    def _materialize(self, date):
+        day = self.days.get(date)
+        if day is None:
+            stored = self.store.load_tasks(date) or {}
+            day = {"up_next": list(stored.get("up_next", [])),
+                   "done_today": list(stored.get("done_today", [])),
+                   "seq": stored.get("seq") or 0}
+            self.days[date] = day
+        return day
+
+    # (Opened for each append rather than kept open, so another process can rename it to compact it)
+    def _append(self, record):
+        with perf.span("storage.journal_append") as span:
+            line = (json.dumps(record, separators=(",", ":"), default=task_json) + "\n").encode("utf-8")
+            with open(self.path, "ab") as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+            span.bytes_written = len(line)
+        self.size += len(line)
+
+    # New, empty journal file (call with both locks held); sequence numbers carry on across journals
+    def _start_journal(self):
+        self.size = 0
+        self._append({"seq": self.seq, "op": "start", "id": uuid.uuid4().hex})
+        self.identity = journal_identity(self.path)
+
+    def _notify(self, task_dates, note_dates):
+        if self.change_handler is not None and (task_dates is None or task_dates or note_dates):
+            self.change_handler(task_dates, note_dates)
+
+    def set_change_handler(self, handler):
+        self.change_handler = handler
+
+    # Pick up what other processes have saved since we last looked (the app calls this every few seconds)
+    def sync(self):
+        with self.lock, self.file_lock:
+            changed = self._sync()
+        self._notify(*changed)
+
+    # The base for merging the next save of `date` (call with self.lock held). Only the most
+    # recent days are remembered; saving one of the others simply overwrites, as it always did.
+    def _remember(self, date, lists):
+        self.known[date] = lists
+        self.known.move_to_end(date)
+        while len(self.known) > DAY_CACHE_SIZE:
+            self.known.popitem(last=False)
+
+    def load_tasks(self, date):
+        with self.lock:
+            day = self.days.get(date)
+            if day is None:
+                day = self.store.load_tasks(date)
+            # (the base keeps its own copy: callers are free to change the lists they get back)
+            base = {"up_next": list(day["up_next"]), "done_today": list(day["done_today"])} if day else None
+            self._remember(date, base or {"up_next": [], "done_today": []})
+        return {"up_next": list(base["up_next"]), "done_today": list(base["done_today"])} if base else None
+
+    def save_tasks(self, date, up_next, done_today):
+        mine = {"up_next": list(up_next), "done_today": list(done_today)}
+        with self.lock, self.file_lock:
+            task_dates, note_dates = self._sync()
+            day = self._materialize(date)
+            base = self.known.get(date)
+            lists = mine if base is None else merge_day(base, mine, day)
+            for op in diff_day(day, lists):
+                self.seq += 1
+                apply_op(day, op)
+                day["seq"] = self.seq
+                self._append({"seq": self.seq, "date": date, **op})
+            # What the caller has, until it loads the day again (copied, as it may keep changing its lists)
+            self._remember(date, {"up_next": list(up_next), "done_today": list(done_today)})
+            if lists != mine and task_dates is not None:
+                task_dates.add(date)  # (they need to load the merged lists)
+            if self.size >= self.compact_bytes and self.compaction is None:
+                self._compact()
+        self._notify(task_dates, note_dates)
+
+    def latest_tasks_before(self, date):
+        with self.lock:
+            journaled = [day for day in self.days if day < date]
+        stored = self.store.latest_tasks_before(date)
+        if journaled and (stored is None or max(journaled) >= stored[0]):
+            day = max(journaled)
+            return day, self.load_tasks(day)
+        return stored
+
+    def task_dates(self):
+        with self.lock:
+            journaled = set(self.days)
+        return sorted(journaled.union(self.store.task_dates()))
+
+    def load_note(self, date):
+        return self.store.load_note(date)
+
+    def save_note(self, date, notes):
+        self.store.save_note(date, notes)
+        with self.lock, self.file_lock:
+            task_dates, note_dates = self._sync()
+            self.seq += 1
+            self._append({"seq": self.seq, "date": date, "op": "note"})
+            if self.size >= self.compact_bytes and self.compaction is None:
+                self._compact()
+        self._notify(task_dates, note_dates)
+
+    def note_dates(self):
+        return self.store.note_dates()
+
+    def archive_old_days(self, after_days=None, stop=None):
+        return self.store.archive_old_days(after_days, stop)
+
+    # Swap in an empty journal (call with both locks held) and fold the old one into the store.
+    # If another process's compaction is still being folded, ours waits until it's done.
+    def _compact(self):
+        if os.path.exists(self.compacting_path):
+            self._start_compaction()  # (in case that process died before finishing it)
+            return
+        os.replace(self.path, self.compacting_path)
+        self._start_journal()
+        self._start_compaction()
+
+    # Fold the .compacting journal in on a background thread, unless someone already is
+    def _start_compaction(self):
+        if not self.fold_lock.acquire(blocking=False):
+            return
+        snapshot = {date: {"up_next": list(day["up_next"]), "done_today": list(day["done_today"]), "seq": day["seq"]}
+                    for date, day in self.days.items()}
+        self.compaction = threading.Thread(target=self._fold, args=(self.seq, snapshot), name="journal-compaction")
+        self.compaction.start()
+
+    def _fold(self, seq, snapshot):
+        try:
+            for date, day in snapshot.items():
+                with self.file_lock:
+                    self.store.save_tasks(date, day["up_next"], day["done_today"], seq=day["seq"])
+            with self.file_lock:
+                os.remove(self.compacting_path)
+        finally:
+            self.fold_lock.release()
+        with self.lock:
+            # Days with no edits since the snapshot now live in the store alone
+            for date in snapshot:
+                if date in self.days and self.days[date]["seq"] <= seq:
+                    del self.days[date]
+            self.compaction = None
+
+    # Wait for any compaction in progress, then close the journal and the store
+    def close(self):
+        compaction = self.compaction
+        if compaction is not None:
+            compaction.join()
+        self.fold_lock.close()
+        self.store.close()
+
+
+# Raised by flush() / close() when some saves still couldn't be written
+class SaveError(Exception):
+    pass
+
+
+# Does the actual saving on a background thread, so a slow disk never stalls the window.
+# save_tasks / save_note just record an immutable snapshot (tuples, str) and return; if a day is
+# saved again before the worker gets to it, only the newest snapshot is written. Loads check the
+# unwritten snapshots first, so the app always reads back what it last saved.
+# flush() blocks until everything queued so far is on disk.
+#
+# A save that fails (disk full, file locked, ...) isn't dropped: it's kept, retried every
+# SAVE_RETRY_SECONDS, and reported to error_handler(kind, date, exception) -- called on the
+# worker thread -- and by flush() / close() raising SaveError if it still fails then.
+class PersistenceWorker:
+    def __init__(self, store):
+        self.store = store
+        self.root = store.root
+        self.pending = {}  # ("tasks" | "note", date) -> newest snapshot, not written yet
+        self.writing = {}  # the batch the worker is writing right now
+        self.failed = {}   # snapshots whose save failed, waiting to be retried
+        self.error = None  # (kind, date, exception) of the latest failure
+        self.error_handler = None
+        self.closed = False
+        self.cond = threading.Condition()
+        self.thread = threading.Thread(target=self._run, name="persistence", daemon=True)
+        self.thread.start()
+
+    def _queue(self, key, value):
+        with self.cond:
+            self.pending[key] = value
+            self.failed.pop(key, None)  # (superseded)
+            self.cond.notify_all()
+
+    # Newest snapshot for `key` that may not have reached the store yet (call with self.cond held)
+    def _unwritten(self, key):
+        if key in self.pending:
+            return self.pending[key]
+        if key in self.writing:
+            return self.writing[key]
+        return self.failed.get(key)
+
+    def _unwritten_dates(self, kind):
+        with self.cond:
+            return {date for (k, date) in list(self.pending) + list(self.writing) + list(self.failed) if k == kind}
+
+    # Queue the failed saves again (call with self.cond held)
+    def _retry(self):
+        for key, value in self.failed.items():
+            self.pending.setdefault(key, value)
+        self.failed = {}
+        self.cond.notify_all()
+
+    def _run(self):
+        while True:
+            with self.cond:
+                while not self.pending and not self.closed:
+                    if not self.cond.wait(SAVE_RETRY_SECONDS if self.failed else None):
+                        self._retry()
+                if not self.pending:
+                    return
+                self.writing, self.pending = self.pending, {}
+            errors = []
+            for (kind, date), value in self.writing.items():
+                try:
+                    if kind == "tasks":
+                        self.store.save_tasks(date, *value)
+                    else:
+                        self.store.save_note(date, value)
+                except Exception as e:
+                    print(f"Could not save {kind} for {date} (will retry):", flush=True)
+                    traceback.print_exc()
+                    errors.append(((kind, date), value, e))
+            with self.cond:
+                for key, value, e in errors:
+                    if key not in self.pending:  # (unless it's been saved again since)
+                        self.failed[key] = value
+                    self.error = key + (e,)
+                self.writing = {}
+                self.cond.notify_all()
+            if errors and self.error_handler is not None:
+                self.error_handler(*errors[-1][0], errors[-1][2])
+
+    def save_tasks(self, date, up_next, done_today):
+        self._queue(("tasks", date), (tuple(up_next), tuple(done_today)))
+
+    def save_note(self, date, notes):
+        self._queue(("note", date), notes)
+
+    def load_tasks(self, date):
+        with self.cond:
+            value = self._unwritten(("tasks", date))
+        if value is not None:
+            return {"up_next": list(value[0]), "done_today": list(value[1])}
+        return self.store.load_tasks(date)
+
+    def load_note(self, date):
+        with self.cond:
+            value = self._unwritten(("note", date))
+        if value is not None:
+            return value
+        return self.store.load_note(date)
+
+    def latest_tasks_before(self, date):
+        unwritten = [day for day in self._unwritten_dates("tasks") if day < date]
+        stored = self.store.latest_tasks_before(date)
+        if unwritten and (stored is None or max(unwritten) >= stored[0]):
+            day = max(unwritten)
+            return day, self.load_tasks(day)
+        return stored
+
+    def task_dates(self):
+        unwritten = self._unwritten_dates("tasks")
+        return sorted(unwritten.union(self.store.task_dates()))
+
+    def note_dates(self):
+        unwritten = self._unwritten_dates("note")
+        return sorted(unwritten.union(self.store.note_dates()))
+
+    # (Runs on the caller's thread; unwritten saves land in day files afterwards, as usual)
+    def archive_old_days(self, after_days=None, stop=None):
+        return self.store.archive_old_days(after_days, stop)
+
+    # (Also on the caller's thread; see TaskJournal)
+    def sync(self):
+        self.store.sync()
+
+    def set_change_handler(self, handler):
+        self.store.set_change_handler(handler)
+
+    # Barrier: returns once every save queued before the call has been written. Failed saves
+    # are tried once more first; raises SaveError if any still fail (they stay queued).
+    def flush(self):
+        with self.cond:
+            self._retry()
+            while self.pending or self.writing:
+                self.cond.wait()
+            self._raise_failed()
+
+    def close(self):
+        with self.cond:
+            self._retry()
+            self.closed = True
+            self.cond.notify_all()
+        self.thread.join()
+        self.store.close()
+        self._raise_failed()
+
+    def _raise_failed(self):
+        if self.failed:
+            kind, date, error = self.error
+            raise SaveError(f"{len(self.failed)} save(s) couldn't be written (last: {kind} for {date}: {error})")
+
+
+# Stands in for "nothing saved for that day" in the cache, since None means "not cached"
+MISSING = object()
+
+
+# Sorted list of 'YYYY-MM-DD' dates that have data. Lookups are a binary search; new dates
+# are slotted in as they're saved (usually at the end, since that's where today is).
+class DateIndex:
+    def __init__(self, dates=()):
+        self.dates = sorted(set(dates))
+
+    def __contains__(self, date):
+        i = bisect.bisect_left(self.dates, date)
+        return i < len(self.dates) and self.dates[i] == date
+
+    def __len__(self):
+        return len(self.dates)
+
+    def add(self, date):
+        i = bisect.bisect_left(self.dates, date)
+        if i == len(self.dates) or self.dates[i] != date:
+            self.dates.insert(i, date)
+
+    # Nearest date strictly before / after `date`, or None
+    def before(self, date):
+        i = bisect.bisect_left(self.dates, date)
+        return self.dates[i - 1] if i > 0 else None
+
+    def after(self, date):
+        i = bisect.bisect_right(self.dates, date)
+        return self.dates[i] if i < len(self.dates) else None
+
+
+# In-memory LRU cache of parsed days (tasks and notes), bounded to `size` entries per kind,
+# so flicking back and forth between days is served from memory. prefetch() loads days on a
+# background thread ahead of the user getting there. Saves go through the cache: the entry is
+# replaced with what was saved, and a prefetch that raced with the save is thrown away.
+#
+# It also keeps a DateIndex of which days have tasks / notes (built from the store the first
+# time it's needed, then kept up to date on save), so the rollover lookup and jumping to the
+# previous or next day with content are binary searches rather than a walk over the data.
+# Days another process saves are dropped from both as the journal notices them (see sync).
+class DayCache:
+    def __init__(self, store, size=DAY_CACHE_SIZE):
+        self.store = store
+        self.root = store.root
+        self.size = size
+        self.entries = {"tasks": collections.OrderedDict(), "note": collections.OrderedDict()}
+        self.versions = collections.Counter()  # (kind, date) -> number of saves, to spot stale prefetches
+        self.lock = threading.Lock()
+        self.prefetcher = None  # started by the first prefetch (the command line never needs one)
+        self.indexes = None  # {"tasks": DateIndex, "note": DateIndex}, built on first use
+        self.archiver = None  # see archive_in_background
+        self.archive_stop = threading.Event()
+        self.generation = 0  # bumped when every entry is thrown away, to spot stale prefetches too
+        self.change_handler = None
+        store.set_change_handler(self._changed)
+
+    def _get(self, kind, date):
+        with self.lock:
+            entries = self.entries[kind]
+            value = entries.get(date)
+            if value is not None:
+                entries.move_to_end(date)
+            return value
+
+    def _put(self, kind, date, value):
+        entries = self.entries[kind]
+        entries[date] = value
+        entries.move_to_end(date)
+        while len(entries) > self.size:
+            entries.popitem(last=False)
+
+    def _load(self, kind, date):
+        if kind == "tasks":
+            day = self.store.load_tasks(date)
+            return MISSING if day is None else (tuple(day.get("up_next", [])), tuple(day.get("done_today", [])))
+        notes = self.store.load_note(date)
+        return MISSING if notes is None else notes
+
+    def _fetch(self, kind, date):
+        value = self._get(kind, date)
+        if value is None:
+            with self.lock:
+                version = self.generation, self.versions[kind, date]
+            value = self._load(kind, date)
+            with self.lock:
+                if (self.generation, self.versions[kind, date]) == version:
+                    self._put(kind, date, value)
+        return None if value is MISSING else value
+
+    def load_tasks(self, date):
+        value = self._fetch("tasks", date)
+        if value is None:
+            return None
+        return {"up_next": list(value[0]), "done_today": list(value[1])}
+
+    def load_note(self, date):
+        return self._fetch("note", date)
+
+    def save_tasks(self, date, up_next, done_today):
+        with self.lock:
+            self.versions["tasks", date] += 1
+            self._put("tasks", date, (tuple(up_next), tuple(done_today)))
+            if self.indexes is not None:
+                self.indexes["tasks"].add(date)
+        self.store.save_tasks(date, up_next, done_today)
+
+    def save_note(self, date, notes):
+        with self.lock:
+            self.versions["note", date] += 1
+            self._put("note", date, notes)
+            if self.indexes is not None:
+                self.indexes["note"].add(date)
+        self.store.save_note(date, notes)
+
+    # Call with self.lock held
+    def _index(self, kind):
+        if self.indexes is None:
+            self.indexes = {"tasks": DateIndex(self.store.task_dates()), "note": DateIndex(self.store.note_dates())}
+        return self.indexes[kind]
+
+    # Warm the cache for these days in the background (e.g. either side of the displayed day)
+    def prefetch(self, dates):
+        for date in dates:
+            for kind in ("tasks", "note"):
+                if self._get(kind, date) is None:
+                    self._prefetcher().submit(self._fetch, kind, date)
+
+    # Neighbouring days are prefetched in the background, on a single worker thread
+    def _prefetcher(self):
+        if self.prefetcher is None:
+            import concurrent.futures  # (not at the top: it's slow to import, and only the app prefetches)
+            self.prefetcher = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="prefetch")
+        return self.prefetcher
+
+    def latest_tasks_before(self, date):
+        with self.lock:
+            day = self._index("tasks").before(date)
+        if day is None:
+            return None
+        return day, self.load_tasks(day)
+
+    # Closest day before / after `date` with any tasks or notes saved, or None
+    def prev_day_with_data(self, date):
+        with self.lock:
+            days = [self._index(kind).before(date) for kind in ("tasks", "note")]
+        days = [day for day in days if day is not None]
+        return max(days) if days else None
+
+    def next_day_with_data(self, date):
+        with self.lock:
+            days = [self._index(kind).after(date) for kind in ("tasks", "note")]
+        days = [day for day in days if day is not None]
+        return min(days) if days else None
+
+    def task_dates(self):
+        with self.lock:
+            return list(self._index("tasks").dates)
+
+    def note_dates(self):
+        with self.lock:
+            return list(self._index("note").dates)
+
+    def flush(self):
+        self.store.flush()
+
+    # Check for days another process (cli.py, say) has saved; see set_change_handler
+    def sync(self):
+        self.store.sync()
+
+    # handler(task_dates, note_dates) is called whenever another process's changes are picked up:
+    # sets of dates, or None for "any day may have changed". Called on whichever thread noticed,
+    # after the cache has forgotten those days.
+    def set_change_handler(self, handler):
+        self.change_handler = handler
+
+    def _changed(self, task_dates, note_dates):
+        with self.lock:
+            if task_dates is None or note_dates is None:
+                self.generation += 1
+                for entries in self.entries.values():
+                    entries.clear()
+                self.indexes = None  # (rebuilt on next use)
+            else:
+                for kind, dates in (("tasks", task_dates), ("note", note_dates)):
+                    for date in dates:
+                        self.versions[kind, date] += 1
+                        self.entries[kind].pop(date, None)
+                        if self.indexes is not None:
+                            self.indexes[kind].add(date)
+        if self.change_handler is not None:
+            self.change_handler(task_dates, note_dates)
+
+    # handler(kind, date, exception) is called (on the save thread) whenever a save fails
+    def set_error_handler(self, handler):
+        self.store.error_handler = handler
+
+    # Archiving doesn't change what any day holds, so cached days and indexes stay as they are
+    def archive_old_days(self, after_days=None, stop=None):
+        return self.store.archive_old_days(after_days, stop)
+
+    # Run archive_old_days on a background thread (the app does this once it's up); close()
+    # stops it after the month it's on
+    def archive_in_background(self):
+        self.archiver = threading.Thread(target=self._archive, name="archive", daemon=True)
+        self.archiver.start()
+
+    def _archive(self):
+        try:
+            count = self.store.archive_old_days(stop=self.archive_stop)
+        except Exception:
+            print("Could not archive old days:", flush=True)
+            traceback.print_exc()
+            return
+        if count:
+            print(f"Archived {count} month(s) of old days", flush=True)
+
+    def close(self):
+        if self.archiver is not None:
+            self.archive_stop.set()
+            self.archiver.join()
+        if self.prefetcher is not None:
+            self.prefetcher.shutdown(wait=True, cancel_futures=True)
+        self.store.close()
+
+
+STORES = {"json": ShardedStore, "sqlite": SQLiteStore}
+
+
+# Open the backend picked by $LITTLEBITS_STORAGE (defaults to per-day JSON files)
+def open_store(kind=None, root=DATA_DIR, cache_size=DAY_CACHE_SIZE):
+    kind = kind or os.environ.get(STORAGE_ENV_VAR, "json")
+    if kind not in STORES:
+        raise ValueError(f"Unknown storage backend {kind!r} (expected one of: {', '.join(STORES)})")
+    return DayCache(PersistenceWorker(TaskJournal(STORES[kind](root))), cache_size)
+
+
+# Moving between backends goes through the old two-file JSON format, e.g.
+#   python storage.py export --to backup/                  (from the per-day files)
+#   python storage.py import --from backup/ --backend sqlite
+# and `python storage.py archive [--days N]` runs an archive pass right away (see ShardedStore)
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import/export Little Bits data as task_lists.json + notes.json")
+    parser.add_argument("command", choices=["import", "export", "archive"])
+    parser.add_argument("--backend", choices=list(STORES), default=None, help=f"defaults to ${STORAGE_ENV_VAR} or json")
+    parser.add_argument("--data", default=DATA_DIR, help="data folder (default: data)")
+    parser.add_argument("--from", dest="source", help="folder to import task_lists.json / notes.json from")
+    parser.add_argument("--to", dest="target", help="folder to export task_lists.json / notes.json to")
+    parser.add_argument("--days", type=int, default=None,
+                        help=f"archive months older than this many days (default: ${ARCHIVE_DAYS_ENV_VAR} or {ARCHIVE_AFTER_DAYS})")
+    args = parser.parse_args(argv)
+
+    store = open_store(args.backend, args.data)
+    if args.command == "import":
+        if not args.source:
+            parser.error("import needs --from")
+        import_json(store, args.source)
+    elif args.command == "archive":
+        print(f"Archived {store.archive_old_days(args.days)} month(s)")
+    else:
+        if not args.target:
+            parser.error("export needs --to")
+        export_json(store, args.target)
+    store.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())